@@ -1,17 +1,23 @@
 #!/usr/bin/env python3
 """Builds the .rst files that autodoc will use to generate the documentation."""
+import argparse
+import concurrent.futures
+import filecmp
+import functools
+import hashlib
+import itertools
+import json
 import os
-import sys
 import re
+import shutil
+from collections.abc import Callable
 
 
 def makeTitle(text: str, borderChar: str, upperBorder: bool = False):
     border = borderChar * len(text)
     if upperBorder:
-        fmtStr = "\n{border:s}\n{text:s}\n{border:s}\n\n"
-    else:
-        fmtStr = "\n{text:s}\n{border:s}\n\n"
-    return fmtStr.format(text=text, border=border)
+        return f"\n{border}\n{text}\n{border}\n\n"
+    return f"\n{text}\n{border}\n\n"
 
 
 filesText = ["workflow", "programs", "setup", "breakingChanges",
@@ -45,11 +51,55 @@ filesToolsMajor = ["addNoise.py"]
 
 filesToolsApi = ["plots.py", "slurm.py", "addNoiseUtils.py"]
 
+# Classify every module by the kind of documentation page it gets.
+_CATEGORY: dict[str, str] = {}
+for _category, _files in (("major", filesMajor), ("major", filesToolsMajor),
+                          ("minor", filesMinor), ("minor", filesToolsMinor),
+                          ("api", filesApi), ("api", filesToolsApi),
+                          ("api", filesInternalApi)):
+    for _fname in _files:
+        _CATEGORY[_fname] = _category
+
+# Module names without the .py suffix.
+_MAJOR_STEMS = tuple(f[:-3] for f in filesMajor)
+_MINOR_STEMS = tuple(f[:-3] for f in filesMinor)
+_API_STEMS = tuple(f[:-3] for f in filesApi)
+_INTERNAL_API_STEMS = tuple(f[:-3] for f in filesInternalApi)
+_TOOLS_MINOR_STEMS = tuple(f[:-3] for f in filesToolsMinor)
+_TOOLS_MAJOR_STEMS = tuple(f[:-3] for f in filesToolsMajor)
+_TOOLS_API_STEMS = tuple(f[:-3] for f in filesToolsApi)
+# Module pages, grouped by the directory their source lives in.
+_SRC_STEMS = _MAJOR_STEMS + _MINOR_STEMS + _API_STEMS
+_TOOLS_STEMS = _TOOLS_API_STEMS + _TOOLS_MINOR_STEMS + _TOOLS_MAJOR_STEMS
+# Everything that has a grammar in bnf/.
+_BNF_STEMS = tuple(f[:-3] for f, category in _CATEGORY.items() if category == "major") \
+    + ("base", "seqletQuantileCutoffs")
+_BNF_STEM_SET = frozenset(_BNF_STEMS)
+
 nameModifiers = {
-    "tools.": filesToolsApi + filesToolsMajor + filesToolsMinor,
-    "internal.": filesInternalApi
+    "tools.": frozenset(filesToolsApi + filesToolsMajor + filesToolsMinor),
+    "internal.": frozenset(filesInternalApi)
 }
 
+# The body of a module's page, keyed by its category.
+_TEMPLATES: dict[str, str] = {
+    "major": (".. automodule:: bpreveal.{fmtModName}\n    :members:\n\n"
+              ".. highlight:: python\n\n"
+              + makeTitle("Schema", "-", False)
+              + ".. highlight:: json\n"
+              ".. literalinclude:: ../../src/schematools/{modName}.schema\n\n"),
+    "minor": (makeTitle("Help Info", "-", False)
+              + ".. highlight:: none\n\n"
+              ".. argparse::\n"
+              "    :module: bpreveal.{fmtModName}\n"
+              "    :func: getParser\n"
+              "    :prog: {modName}\n\n"
+              + makeTitle("Usage", "-", False)
+              + "\n.. highlight:: python\n\n"
+              ".. automodule:: bpreveal.{fmtModName}\n    :members:\n\n"),
+    "api": ".. automodule:: bpreveal.{fmtModName}\n    :members:\n\n"}
+
+
 def formatModuleName(fileName):
     moduleBase = fileName
     if fileName[-3:] == ".py":
@@ -60,212 +110,302 @@ def formatModuleName(fileName):
     return moduleBase
 
 
+# The source of this script, used to tell when generated files are stale.
+with open(__file__, "rb") as _scriptFp:
+    _SCRIPT_BYTES = _scriptFp.read()
+
+_MAKEHEADER_HASH_FNAME = "_generated/.makeHeader.hash"
+
+# Static blocks of text that don't depend on any input.
+_AUTOGEN_TEXT = ".. Autogenerated by build.py\n"
+
+_CLEARPAGE_TEXT = "\n.. raw:: latex\n\n    \\clearpage\n"
+
+_INDICES_TEXT = makeTitle("Indices", "*", True) + \
+    "* :ref:`genindex`\n* :ref:`modindex`\n* :ref:`search`\n"
+
+# Files that makeBase generates.
+_BASE_TARGETS = ("_generated/text.rst", "_generated/majorcli.rst",
+                 "_generated/minorcli.rst", "_generated/api.rst",
+                 "_generated/development.rst", "_generated/toolsapi.rst",
+                 "_generated/toolsminor.rst", "_generated/toolsmajor.rst",
+                 "_generated/internalapi.rst",
+                 "index.rst")
+
+_TOCTREE_TEXT = "\n.. toctree::\n    :maxdepth: 2\n\n"
+
+# The section pages that makeBase builds. Everything but the prose in
+# text/<name>.rst is known up front, so each entry holds
+# (name, text before the prose, text after the prose).
+_BASE_PAGES = tuple(
+    (outName,
+     _AUTOGEN_TEXT + makeTitle(title, "*", True),
+     _TOCTREE_TEXT + "".join(f"    {x}\n" for x in contents))
+    for outName, title, contents in (
+        ("text", "Overview", filesText),
+        ("majorcli", "Main CLI", _MAJOR_STEMS),
+        ("minorcli", "Utility CLI", _MINOR_STEMS),
+        ("api", "API", _API_STEMS),
+        ("toolsminor", "Tools Utility CLI", _TOOLS_MINOR_STEMS),
+        ("toolsmajor", "Tools Main CLI", _TOOLS_MAJOR_STEMS),
+        ("toolsapi", "Tools API", _TOOLS_API_STEMS),
+        ("internalapi", "Internal", _INTERNAL_API_STEMS),
+        ("development", "Development", filesDevelopment)))
+
+_INDEX_HEADER = _AUTOGEN_TEXT + "\n" + makeTitle("BPReveal Documentataion", "=", True)
+
+_INDEX_FOOTER = _TOCTREE_TEXT \
+    + "".join(f"    _generated/{page[0]}\n" for page in _BASE_PAGES) \
+    + _INDICES_TEXT
+
+
+def writeIfChanged(fname: str, text: str):
+    """Write text to fname, but leave the file alone if it already has that content.
+
+    Not touching an unchanged file keeps its mtime, so make and sphinx don't
+    rebuild everything downstream of it.
+    """
+    newBytes = text.encode("utf-8")
+    try:
+        with open(fname, "rb") as fp:
+            if fp.read() == newBytes:
+                return
+    except FileNotFoundError:
+        pass
+    with open(fname, "wb") as fp:
+        fp.write(newBytes)
+
+
+def copyIfChanged(srcFname: str, dstFname: str):
+    """Copy srcFname to dstFname, unless dstFname already has the same content."""
+    if os.path.exists(dstFname) and filecmp.cmp(srcFname, dstFname, shallow=False):
+        return
+    shutil.copyfile(srcFname, dstFname)
+
+
+def _makefileText() -> str:
+    """Get the contents of _generated/makeHeader.
+
+    This depends only on the file lists at the top of this script.
+    """
+    parts: list[str] = []
+    for stem in _SRC_STEMS:
+        parts.append(f"_generated/{stem}.rst: ../src/{stem}.py build.py\n\t./build.py {stem}\n\n")
+    for stem in _TOOLS_STEMS:
+        parts.append(f"_generated/{stem}.rst: ../src/tools/{stem}.py build.py\n"
+                     f"\t./build.py {stem}\n\n")
+    for stem in _INTERNAL_API_STEMS:
+        parts.append(f"_generated/{stem}.rst: ../src/internal/{stem}.py build.py\n"
+                     f"\t./build.py {stem}\n\n")
+    for fname in filesText + filesDevelopment:
+        parts.append(f"_generated/{fname}.rst: text/{fname}.rst build.py\n\t./build.py {fname}\n\n")
+    for stem in _BNF_STEMS:
+        parts.append(f"_generated/bnf/{stem}.rst: build.py\n\t./build.py bnf/{stem}.rst\n\n")
+    for fname in _BASE_TARGETS:
+        sourceFile = fname.rsplit("/", maxsplit=1)[-1]
+        if fname == "index.rst":
+            sourceFile = "title.rst"
+        parts.append(f"{fname}: build.py text/{sourceFile}\n\t./build.py base\n\n")
+    allTargets = itertools.chain(
+        (f"_generated/{stem}.rst" for stem in _SRC_STEMS + _TOOLS_STEMS + _INTERNAL_API_STEMS),
+        (f"_generated/{fname}.rst" for fname in filesText + filesDevelopment),
+        (f"_generated/bnf/{stem}.rst" for stem in _BNF_STEMS),
+        _BASE_TARGETS)
+    parts.append("allGenerated = " + " ".join(allTargets) + "\n")
+    return "".join(parts)
+
+
 def makeHeader():
-    with open("_generated/makeHeader", "w") as fp:
-        allTargets = []
-        for fname in filesMajor + filesMinor + filesApi:
-            fp.write("_generated/{0:s}.rst: ../src/{0:s}.py build.py\n\t./build.py {0:s}\n\n".
-                     format(fname[:-3]))
-            allTargets.append("_generated/{0:s}.rst".format(fname[:-3]))
-        for fname in filesToolsApi + filesToolsMinor + filesToolsMajor:
-            fp.write("_generated/{0:s}.rst: ../src/tools/{0:s}.py build.py\n\t./build.py {0:s}\n\n".
-                     format(fname[:-3]))
-            allTargets.append("_generated/{0:s}.rst".format(fname[:-3]))
-        for fname in filesInternalApi:
-            fp.write(("_generated/{0:s}.rst: ../src/internal/{0:s}.py"
-                      " build.py\n\t./build.py {0:s}\n\n").
-                     format(fname[:-3]))
-            allTargets.append("_generated/{0:s}.rst".format(fname[:-3]))
-
-        for fname in filesText + filesDevelopment:
-            fp.write("_generated/{0:s}.rst: text/{0:s}.rst build.py\n\t./build.py {0:s}\n\n".
-                     format(fname))
-            allTargets.append("_generated/{0:s}.rst".format(fname))
-        for fname in filesMajor + filesToolsMajor + ["base.xx", "seqletQuantileCutoffs.xx"]:
-            fp.write(
-                "_generated/bnf/{0:s}.rst: build.py\n\t./build.py bnf/{0:s}.rst\n\n"
-                .format(fname[:-3]))
-            allTargets.append("_generated/bnf/{0:s}.rst".format(fname[:-3]))
-        for fname in ["_generated/text.rst", "_generated/majorcli.rst",
-                      "_generated/minorcli.rst", "_generated/api.rst",
-                      "_generated/development.rst", "_generated/toolsapi.rst",
-                      "_generated/toolsminor.rst", "_generated/toolsmajor.rst",
-                      "_generated/internalapi.rst",
-                      "index.rst"]:
-            sourceFile = fname.rsplit("/", maxsplit=1)[-1]
-            if fname == "index.rst":
-                sourceFile = "title.rst"
-            fp.write("{0:s}: build.py text/{1:s}\n\t./build.py base\n\n".format(fname, sourceFile))
-            allTargets.append("{0:s}".format(fname))
-        fp.write("allGenerated = " + " ".join(allTargets) + "\n")
+    # The header is a pure function of this script, so if the script hasn't
+    # changed since the last build there's nothing to do.
+    scriptHash = hashlib.sha256(_SCRIPT_BYTES).hexdigest()
+    try:
+        with open(_MAKEHEADER_HASH_FNAME, "r") as fp:
+            oldHash = fp.read()
+    except FileNotFoundError:
+        oldHash = None
+    if oldHash == scriptHash and os.path.exists("_generated/makeHeader"):
+        return
+    writeIfChanged("_generated/makeHeader", _makefileText())
+    writeIfChanged(_MAKEHEADER_HASH_FNAME, scriptHash)
 
 
 def makeBase():
-    ftypes = [["text", "Overview", filesText],
-              ["majorcli", "Main CLI", filesMajor],
-              ["minorcli", "Utility CLI", filesMinor],
-              ["api", "API", filesApi],
-              ["toolsminor", "Tools Utility CLI", filesToolsMinor],
-              ["toolsmajor", "Tools Main CLI", filesToolsMajor],
-              ["toolsapi", "Tools API", filesToolsApi],
-              ["internalapi", "Internal", filesInternalApi],
-              ["development", "Development", filesDevelopment]]
-
-    for outName, title, contents in ftypes:
-        with open(f"_generated/{outName:s}.rst", "w") as fp:
-            fp.write(".. Autogenerated by build.py\n")
-            fp.write(makeTitle(title, "*", True))
-            with open("text/{0:s}.rst".format(outName), "r") as fpIn:
-                for line in fpIn:
-                    fp.write(line)
-            fp.write("\n.. toctree::\n    :maxdepth: 2\n\n")
-            for file in contents:
-                modName = re.sub(r"(\.py$)|(\.rst$)", "", file)
-                fp.write("    {0:s}\n".format(modName))
+    for outName, header, toctree in _BASE_PAGES:
+        with open(f"text/{outName}.rst", "r") as fpIn:
+            prose = fpIn.read()
+        writeIfChanged(f"_generated/{outName}.rst", header + prose + toctree)
 
     # Generate a single .rst index
-    with open("index.rst", "w") as fpBig:
-        fpBig.write(".. Autogenerated by build.py\n\n")
-        fpBig.write(makeTitle("BPReveal Documentataion", "=", True))
-        with open("text/title.rst", "r") as inFp:
-            for line in inFp:
-                fpBig.write(line)
-        fpBig.write("\n.. toctree::\n    :maxdepth: 2\n")
-        fpBig.write("\n")
-        for outName, _, _ in ftypes:
-            fpBig.write("    _generated/{0:s}\n".format(outName))
-
-        fpBig.write(makeTitle("Indices", "*", True))
-        fpBig.write(
-            "* :ref:`genindex`\n* :ref:`modindex`\n* :ref:`search`\n")
+    with open("text/title.rst", "r") as inFp:
+        prose = inFp.read()
+    writeIfChanged("index.rst", _INDEX_HEADER + prose + _INDEX_FOOTER)
 
 
-def makeBnf(request):
-    modRequested = request[4:][:-4]  # strip bnf/ and .rst.
-    for fname in filesMajor + filesToolsMajor + ["base.xx", "seqletQuantileCutoffs.xx"]:
-        modName = fname[:-3]
-        if modRequested == modName:
-            inFname = "bnf/{0:s}.bnf".format(modName)
-            with open("_generated/bnf/{0:s}.rst".format(modName), "w") as outFp, \
-                    open(inFname, "r") as inFp:
-                for line in inFp:
-                    if m := re.match("[^<]*<([^>]*)> ::=", line):
-                        # Create an anchor that I can jump to.
-                        outFp.write('.. raw:: html\n\n')
-                        outFp.write('    <a name="{0:s}"></a>\n\n'.format(m.group(1)))
-                        outFp.write(".. _{0:s}:\n\n".format(m.group(1)))
-                        outFp.write(".. highlight:: none\n\n")
-                        outFp.write(".. parsed-literal::\n\n")
-                        outFp.write("    <:ref:`{0:s}<{0:s}>`> ::=\n".format(m.group(1)))
-                    else:
-                        outFp.write("    ")
-                        inName = False
-                        curName = ''
-                        for c in line:
-                            if not inName:
-                                outFp.write(c)
-                                if c == '<':
-                                    inName = True
-                            elif c == '>':
-                                outFp.write(
-                                    ":ref:`{0:s}<{0:s}>`>".format(curName))
-                                inName = False
-                                curName = ''
-                            else:
-                                curName = curName + c
+# A line that defines a rule, like ``<name> ::=``.
+_BNF_RULE_RE = re.compile(r"[^<]*<([^>]*)> ::=")
+# Any reference to a rule, like ``<name>``.
+_BNF_REF_RE = re.compile(r"<([^>]*)>")
 
 
-def tryBuildFile(fname):
-    modName = fname[:-3]  # Strip off .py
-    fmtModName = formatModuleName(fname)
-    with open("_generated/" + modName + ".rst", "w") as fp:
-
-        fp.write(".. Autogenerated by build.py\n")
-        fp.write(makeTitle(fmtModName, '=', False))
-
-        if fname in filesMajor + filesToolsMajor:
-            fp.write(".. automodule:: bpreveal.{0:s}\n    :members:\n\n".
-                     format(fmtModName))
-            fp.write(".. highlight:: python\n\n")
-            fp.write(makeTitle("Schema", "-", False))
-            fp.write(".. highlight:: json\n")
-            fp.write(".. literalinclude:: ../../src/schematools/{0:s}.schema\n\n".
-                     format(modName))
-
-        elif fname in filesMinor + filesToolsMinor:
-            fp.write(makeTitle("Help Info", "-", False))
-            fp.write(".. highlight:: none\n\n")
-            fp.write(".. argparse::\n")
-            fp.write("    :module: bpreveal.{0:s}\n".format(fmtModName))
-            fp.write("    :func: getParser\n")
-            fp.write("    :prog: {0:s}\n\n".format(modName))
-            fp.write(makeTitle("Usage", "-", False))
-            fp.write("\n.. highlight:: python\n\n")
-            fp.write(".. automodule:: bpreveal.{0:s}\n    :members:\n\n".
-                     format(fmtModName))
-        elif modName == "schema":
-            fp.write(".. automodule:: bpreveal.{0:s}\n\n".
-                     format(fmtModName))
-            fp.write(
-                "    .. autodata:: schemaMap(dict[str, Draft7Validator])\n")
-            fp.write("        :annotation:\n\n")
-            for majorFile in filesMajor + filesToolsMajor:
-                fp.write("    .. autodata:: {0:s}(Draft7Validator)\n".format(
-                    majorFile[:-3]))
-                fp.write("        :annotation:\n\n")
+def _bnfRefRepl(m: re.Match) -> str:
+    name = m.group(1)
+    return f"<:ref:`{name}<{name}>`>"
+
+
+_OUTPUT_DIRS = ("_generated", "_generated/static", "_generated/bnf")
+
+_BNF_CACHE_FNAME = "_generated/bnf/.cache.json"
+
+
+def _loadBnfCache() -> dict[str, str]:
+    """Get the map of bnf name → hash of the source that its .rst was built from."""
+    try:
+        with open(_BNF_CACHE_FNAME, "r") as fp:
+            return json.load(fp)
+    except (FileNotFoundError, json.JSONDecodeError):
+        # A missing or mangled cache just means we rebuild.
+        return {}
 
+
+def _saveBnfCache(cache: dict[str, str]):
+    # Separate make jobs may each save at once, so write to a temporary file
+    # and move it into place. Worst case, a racing writer drops an entry
+    # and that file gets rebuilt next time. buildAll avoids the race by
+    # saving once, after all its workers are done.
+    tmpFname = f"{_BNF_CACHE_FNAME}.{os.getpid():d}"
+    with open(tmpFname, "w") as fp:
+        json.dump(cache, fp)
+    os.replace(tmpFname, _BNF_CACHE_FNAME)
+
+
+def _bnfToRst(bnfText: str) -> str:
+    """Turn the text of a .bnf file into rst, with a link for every rule name."""
+    parts = []
+    for line in bnfText.splitlines(keepends=True):
+        if m := _BNF_RULE_RE.match(line):
+            ruleName = m.group(1)
+            # Create an anchor that I can jump to.
+            parts.append('.. raw:: html\n\n')
+            parts.append(f'    <a name="{ruleName}"></a>\n\n')
+            parts.append(f".. _{ruleName}:\n\n")
+            parts.append(".. highlight:: none\n\n")
+            parts.append(".. parsed-literal::\n\n")
+            parts.append(f"    <:ref:`{ruleName}<{ruleName}>`> ::=\n")
         else:
-            fp.write(".. automodule:: bpreveal.{0:s}\n    :members:\n\n".
-                     format(fmtModName))
-        fp.write("\n.. raw:: latex\n\n    \\clearpage\n")
-        fp.write("\n.. raw:: latex\n\n    \\clearpage\n")
+            parts.append("    " + _BNF_REF_RE.sub(_bnfRefRepl, line))
+    return "".join(parts)
 
 
-def main():
-    requestName = sys.argv[1]
-    if not os.path.exists("_generated"):
-        os.mkdir("_generated")
-
-    if not os.path.exists("_generated/static"):
-        os.mkdir("_generated/static")
-
-    if not os.path.exists("_generated/bnf"):
-        os.mkdir("_generated/bnf")
-
-    if requestName == "make":
-        # In a bit of an incestuous daisy-chain, this program generates
-        # a file called makeHeader in _generated, and then
-        # the makefile includes it.
-        # The makefile also has a rule to make makeHeader, which invokes
-        # this script. It's amazing that it works!
-        makeHeader()
-        return
+def _buildBnf(modName: str, cache: dict[str, str]) -> tuple[str, str]:
+    """Write the .rst for one bnf file, unless the cache says it's current.
+
+    :return: ``(modName, hash)``, the entry for the cache.
+    """
+    inFname = f"bnf/{modName}.bnf"
+    outFname = f"_generated/bnf/{modName}.rst"
+    with open(inFname, "rb") as inFp:
+        bnfBytes = inFp.read()
+    # The cache key covers this script too, so changing how the
+    # conversion works invalidates everything.
+    bnfHash = hashlib.sha256(_SCRIPT_BYTES + bnfBytes).hexdigest()
+    if cache.get(modName) != bnfHash or not os.path.exists(outFname):
+        writeIfChanged(outFname, _bnfToRst(bnfBytes.decode("utf-8")))
+    return modName, bnfHash
 
-    if requestName == "base":
-        makeBase()
-        return
 
-    if requestName.startswith("bnf/"):
-        makeBnf(requestName)
+def makeBnf(request):
+    modName = request[4:][:-4]  # strip bnf/ and .rst.
+    if modName not in _BNF_STEM_SET:
         return
+    cache = _loadBnfCache()
+    modName, bnfHash = _buildBnf(modName, cache)
+    if cache.get(modName) != bnfHash:
+        cache[modName] = bnfHash
+        _saveBnfCache(cache)
 
-    # Generate a .rst file for every module.
-    for fname in filesMajor + filesMinor + filesApi + \
-            filesToolsMinor + filesToolsApi + filesToolsMajor +\
-            filesInternalApi:
-        if fname == str(requestName) + ".py":
-            tryBuildFile(fname)
-            return
 
-    # Now copy over the prose documentation.
-    #
+def tryBuildFile(fname):
+    modName = fname[:-3]  # Strip off .py
+    fmtModName = formatModuleName(fname)
+    parts = [_AUTOGEN_TEXT, makeTitle(fmtModName, '=', False)]
+
+    if modName == "schema":
+        parts.append(f".. automodule:: bpreveal.{fmtModName}\n\n")
+        parts.append(
+            "    .. autodata:: schemaMap(dict[str, _LazyValidator])\n")
+        parts.append("        :annotation:\n\n")
+        for majorStem in _MAJOR_STEMS + _TOOLS_MAJOR_STEMS:
+            parts.append(f"    .. autodata:: {majorStem}(_LazyValidator)\n")
+            parts.append("        :annotation:\n\n")
+    else:
+        parts.append(_TEMPLATES[_CATEGORY[fname]].format(modName=modName, fmtModName=fmtModName))
+    parts.append(_CLEARPAGE_TEXT)
+    writeIfChanged("_generated/" + modName + ".rst", "".join(parts))
+
+
+def copyProse(fname):
+    copyIfChanged(f"text/{fname}.rst", f"_generated/{fname}.rst")
+
+
+# Every request that this script understands, mapped to the job that builds it.
+# In a bit of an incestuous daisy-chain, the make request generates
+# a file called makeHeader in _generated, and then
+# the makefile includes it.
+# The makefile also has a rule to make makeHeader, which invokes
+# this script. It's amazing that it works!
+_DISPATCH: dict[str, Callable[[], None]] = {"make": makeHeader, "base": makeBase}
+_DISPATCH.update((fname[:-3], functools.partial(tryBuildFile, fname)) for fname in _CATEGORY)
+_DISPATCH.update((f"bnf/{stem}.rst", functools.partial(makeBnf, f"bnf/{stem}.rst"))
+                 for stem in _BNF_STEMS)
+_DISPATCH.update((fname, functools.partial(copyProse, fname))
+                 for fname in filesText + filesDevelopment)
+
+
+def buildAll():
+    """Generate every file at once, spreading the independent ones over a process pool."""
+    makeHeader()
+    makeBase()
+    cache = _loadBnfCache()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        futures = [pool.submit(job) for requestName, job in _DISPATCH.items()
+                   if requestName not in ("make", "base")
+                   and not requestName.startswith("bnf/")]
+        # The bnf jobs hand their hashes back here instead of each saving the
+        # cache, so that they can't overwrite each other's entries.
+        bnfFutures = [pool.submit(_buildBnf, stem, cache) for stem in _BNF_STEMS]
+        for future in concurrent.futures.as_completed(futures + bnfFutures):
+            # Re-raise anything that went wrong in a worker.
+            future.result()
+    newCache = dict(future.result() for future in bnfFutures)
+    if newCache != cache:
+        _saveBnfCache(newCache)
+
+
+def getParser():
+    parser = argparse.ArgumentParser(description="Generate the .rst files for the docs.")
+    parser.add_argument("requestName", nargs="?",
+        help="The file to build, like make, base, bnf/base.rst, or a module name.")
+    parser.add_argument("--all", help="Build every generated file in parallel.",
+        action="store_true", dest="all")
+    return parser
 
-    for fname in filesText + filesDevelopment:
-        if fname == requestName:
-            with open("_generated/{0:s}.rst".format(fname), "w") as fp:
-                with open("text/{0:s}.rst".format(fname), "r") as inFp:
-                    for line in inFp:
-                        fp.write(line)
+
+def main():
+    parser = getParser()
+    args = parser.parse_args()
+    requestName = args.requestName
+    if requestName is None and not args.all:
+        parser.error("Must give a file to build or --all.")
+    for outDir in _OUTPUT_DIRS:
+        os.makedirs(outDir, exist_ok=True)
+
+    if args.all:
+        buildAll()
+        return
+
+    # Unknown requests are quietly ignored.
+    _DISPATCH.get(requestName, lambda: None)()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,8 @@
 """Some utilities for dealing with bed files."""
 from typing import Literal, Any
+import itertools
+import os
+import tempfile
 import multiprocessing
 from collections import deque
 import pybedtools
@@ -9,6 +12,7 @@ import pyBigWig
 from bpreveal import logUtils
 from bpreveal.logUtils import wrapTqdm
 from bpreveal.internal import constants
+from bpreveal.internal import libsegments
 
 
 def makeWhitelistSegments(genome: pysam.FastaFile,
@@ -30,8 +34,6 @@ def makeWhitelistSegments(genome: pysam.FastaFile,
     ``blacklist``, if provided, is a bed file of regions that should be treated as though
     they contained N nucleotides.
     """
-    segments = []
-
     logUtils.debug("Building segments.")
     blacklistsByChrom = {}
     if blacklist is not None:
@@ -41,51 +43,122 @@ def makeWhitelistSegments(genome: pysam.FastaFile,
         for blackInterval in blacklist:
             if blackInterval.chrom not in blacklistsByChrom:
                 blacklistsByChrom[blackInterval.chrom] = []
-            blacklistsByChrom[blackInterval.chrom].append(blackInterval)
+            blacklistsByChrom[blackInterval.chrom].append(
+                (blackInterval.start, blackInterval.end))
+
+    # Each chromosome's segments are written out as soon as they're found, so the
+    # whole genome's worth of segments never has to sit in memory at once.
+    # Registering the file in TEMPFILES lets pybedtools delete it at exit, the same
+    # as the files it makes itself.
+    with tempfile.NamedTemporaryFile(mode="w", prefix="pybedtools.", suffix=".tmp",
+                                     dir=pybedtools.get_tempdir(),
+                                     delete=False) as segmentsFp:
+        pybedtools.BedTool.TEMPFILES.append(segmentsFp.name)
+        for chromName in wrapTqdm(sorted(genome.references), "INFO"):
+            blackSpans = None
+            if chromName in blacklistsByChrom:
+                blackSpans = np.array(blacklistsByChrom[chromName], dtype=np.int64)
+            segmentsFp.write(_chromSegments(genome, chromName, blackSpans))
+    return pybedtools.BedTool(segmentsFp.name)
+
+
+# How much sequence makeWhitelistSegments reads from the fasta at once.
+_FETCH_CHUNK_SIZE = 1 << 24
 
-    for chromName in wrapTqdm(sorted(genome.references), "INFO"):
-        chromSeq = genome.fetch(chromName, 0, genome.get_reference_length(chromName))
-        seqVector = np.fromstring(chromSeq, np.int8)  # type: ignore
-        if chromName in blacklistsByChrom:
-            for blackInterval in blacklistsByChrom[chromName]:
-                if blackInterval.start >= seqVector.shape[0]:
-                    continue
-                endPt = min(seqVector.shape[0], blackInterval.end)
-                seqVector[blackInterval.start:endPt] = ord("N")
-        segments.extend(_findNonN(seqVector, chromName))
-    return pybedtools.BedTool(segments)
+
+def _chromSegments(genome: pysam.FastaFile, chromName: str,
+                   blackSpans: np.ndarray | None) -> str:
+    """Find the segments on one chromosome, reading it a chunk at a time.
+
+    :param genome: A FastaFile (pysam object, not a string filename!).
+    :param chromName: The chromosome to scan.
+    :param blackSpans: (Optional) An array of shape (numSpans, 2) giving the
+        (start, end) of each blacklisted region on this chromosome.
+    :return: BED text, with one line of chrom, start, and end for each segment.
+
+    Only ``_FETCH_CHUNK_SIZE`` bases are held in memory at a time. A segment that
+    reaches the end of a chunk is held open and joined onto the first segment of
+    the next chunk if that one starts right at the boundary.
+    """
+    chromLength = genome.get_reference_length(chromName)
+    lines = []
+    # The start of a segment that ran up to the end of the previous chunk.
+    openStart = None
+    for chunkStart in range(0, chromLength, _FETCH_CHUNK_SIZE):
+        chunkEnd = min(chunkStart + _FETCH_CHUNK_SIZE, chromLength)
+        chunkSeq = genome.fetch(chromName, chunkStart, chunkEnd)
+        seqVector = np.frombuffer(chunkSeq.encode("ascii"), dtype=np.uint8)
+        blackMask = None
+        if blackSpans is not None:
+            blackMask = _blacklistMask(blackSpans, chunkStart, seqVector.shape[0])
+        startPoses, endPoses = _findNonN(seqVector, blackMask)
+        startPoses = startPoses.astype(np.int64) + chunkStart
+        endPoses = endPoses.astype(np.int64) + chunkStart
+        if openStart is not None:
+            if startPoses.shape[0] and startPoses[0] == chunkStart:
+                startPoses[0] = openStart
+            else:
+                # The open segment ended exactly at the chunk boundary.
+                lines.append(f"{chromName}\t{openStart}\t{chunkStart}\n")
+            openStart = None
+        if endPoses.shape[0] and endPoses[-1] == chunkEnd and chunkEnd < chromLength:
+            openStart = int(startPoses[-1])
+            startPoses = startPoses[:-1]
+            endPoses = endPoses[:-1]
+        lines.extend([f"{chromName}\t{startPos}\t{stopPos}\n"
+                      for startPos, stopPos in zip(startPoses.tolist(), endPoses.tolist())])
+    return "".join(lines)
+
+
+def _blacklistMask(blackSpans: np.ndarray, chunkStart: int, chunkLength: int) -> np.ndarray:
+    """Get a boolean mask that is True at every base covered by any of the (start, end) spans.
+
+    :param blackSpans: The blacklisted regions on one chromosome, shape (numSpans, 2).
+    :param chunkStart: Where on the chromosome the mask should start.
+    :param chunkLength: How long the mask should be.
+    :return: A boolean array of shape (chunkLength,), where entry i is for
+        chromosome position chunkStart + i.
+
+    Rather than assign each span separately, this adds 1 at each start and -1 at each
+    end and takes the running sum, which is positive exactly inside a span.
+    Spans that run off either end of the chunk are clipped.
+    """
+    spans = blackSpans.reshape((-1, 2)) - chunkStart
+    spans = spans[(spans[:, 0] < chunkLength) & (spans[:, 1] > 0)]
+    delta = np.zeros((chunkLength + 1,), dtype=np.int32)
+    np.add.at(delta, np.maximum(spans[:, 0], 0), 1)
+    np.add.at(delta, np.minimum(spans[:, 1], chunkLength), -1)
+    np.cumsum(delta, out=delta)
+    return delta[:chunkLength] > 0
 
 
-def _findNonN(inSeq: np.ndarray, chromName: str) -> list[pybedtools.Interval]:
-    """Return a list of Intervals consisting of all regions of the sequence that are not N.
+def _findNonN(inSeq: np.ndarray,
+              blackMask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Find all regions of the sequence that are not N.
 
     :param inSeq: an array of character values - not a one-hot encoded sequence::
 
         inSeq[i] = ord(dnaStr[i])
 
-    :param chromName: Just the name of the chromosome, used to populate the chrom
-        field in the returned Interval objects.
+    :param blackMask: (Optional) A boolean array the same shape as ``inSeq``.
+        Wherever it is True, the base is treated as though it were ``N``.
 
-    :return: A list of Intervals where the sequence is NOT ``n`` or ``N``.
+    :return: Two arrays, giving the start and (exclusive) end of each region
+        where the sequence is NOT ``n`` or ``N``.
     """
-    segments = []
-    # All bases that are not N.
-    isValid = np.logical_not(np.logical_or(inSeq == ord("N"), inSeq == ord("n")))
-    # ends is 1 if this base is the end of a valid region, 0 otherwise.
-    ends = np.empty(isValid.shape, dtype=np.bool_)
-    # starts is 1 if this base is the beginning of a valid region, 0 otherwise.
-    starts = np.empty(isValid.shape, dtype=np.bool_)
-    starts[0] = isValid[0]
-    ends[-1] = isValid[-1]
-
-    ends[:-1] = np.logical_and(isValid[:-1], np.logical_not(isValid[1:]))
-    starts[1:] = np.logical_and(isValid[1:], np.logical_not(isValid[:-1]))
-    # the Poses are the actual indices where the start and end vectors are nonzero.
-    endPoses = np.flatnonzero(ends)  # type: ignore
-    startPoses = np.flatnonzero(starts)  # type: ignore
-    for startPos, stopPos in zip(startPoses, endPoses):
-        segments.append(pybedtools.Interval(chromName, startPos, stopPos + 1))
-    return segments
+    # All bases that are not N. N and n only differ in the ASCII case bit (0x20),
+    # so setting that bit catches both with one compare. The compare writes over
+    # the same buffer, so only one sequence-sized temporary is made.
+    foldedSeq = np.bitwise_or(inSeq, 0x20, dtype=np.uint8)
+    isValid = np.not_equal(foldedSeq, ord("n"), out=foldedSeq.view(np.bool_))
+    if blackMask is not None:
+        # isValid & ~blackMask, without making a temporary for ~blackMask.
+        np.greater(isValid, blackMask, out=isValid)
+    # The C kernel walks the mask once to count the valid runs and once more to
+    # record where each one starts and (exclusively) ends.
+    validBytes = isValid.view(np.int8)
+    numSegments = libsegments.countSegments(validBytes)[0]
+    return libsegments.findSegments(validBytes, numSegments)
 
 
 def tileSegments(inputLength: int, outputLength: int,
@@ -123,35 +196,48 @@ def tileSegments(inputLength: int, outputLength: int,
     padding = (inputLength - outputLength) // 2
     logUtils.debug("Calculated padding of {0:d}".format(padding))
 
-    def shrinkSegment(s: pybedtools.Interval):
-        newEnd = s.end - padding
-        newStart = s.start + padding
-        if newEnd - newStart < outputLength:
-            return False
-        return pybedtools.Interval(s.chrom, newStart, newEnd)
-
-    shrunkSegments = pybedtools.BedTool(segments).each(shrinkSegment).saveas()
-    logUtils.debug("Filtered segments. {0:d} survive.".format(shrunkSegments.count()))
+    segChroms = []
+    segStarts = []
+    segEnds = []
+    for s in wrapTqdm(pybedtools.BedTool(segments), "INFO"):
+        segChroms.append(s.chrom)
+        segStarts.append(s.start)
+        segEnds.append(s.end)
+    # Shrink the segments by the padding and drop the ones that are now too short
+    # to hold a region, all without writing an intermediate bed file.
+    segStarts = np.array(segStarts, dtype=np.int64) + padding
+    segEnds = np.array(segEnds, dtype=np.int64) - padding
+    longEnough = segEnds - segStarts >= outputLength
+    segChroms = [chrom for chrom, keep in zip(segChroms, longEnough.tolist()) if keep]
+    segStarts = segStarts[longEnough]
+    segEnds = segEnds[longEnough]
+    logUtils.debug("Filtered segments. {0:d} survive.".format(len(segChroms)))
 
     # Phase 3. Generate tiling regions.
     logUtils.debug("Creating regions.")
-    regions = []
-    for s in wrapTqdm(shrunkSegments, "INFO"):
-        startPos = s.start
-        endPos = startPos + outputLength
-        while endPos < s.end:
-            curRegion = pybedtools.Interval(s.chrom, startPos, endPos)
-            regions.append(curRegion)
-            startPos += spacing + outputLength
-            endPos = startPos + outputLength
-        if startPos < s.end:
-            # We want another region inside this segment.
-            endPos = s.end
-            startPos = endPos - outputLength
-            regions.append(pybedtools.Interval(s.chrom, startPos, endPos))
-    logUtils.debug("Regions created, {0:d} across genome.".format(len(regions)))
-
-    return pybedtools.BedTool(regions)
+    step = spacing + outputLength
+    # The regularly-spaced regions in a segment are the ones that end before the
+    # segment does, i.e., start + outputLength < end. (This is a ceiling division.)
+    numRegular = np.maximum(0, -((segStarts + outputLength - segEnds) // step))
+    # If the next regular start is still inside the segment, we want another
+    # region there, placed flush with the end of the segment.
+    hasTrailing = segStarts + numRegular * step < segEnds
+    numTiles = numRegular + hasTrailing
+    # For every region, which segment it's in and where it falls in that segment.
+    segIdxes = np.repeat(np.arange(numTiles.shape[0]), numTiles)
+    firstTiles = np.cumsum(numTiles) - numTiles
+    tileNums = np.arange(segIdxes.shape[0]) - firstTiles[segIdxes]
+    starts = segStarts[segIdxes] + tileNums * step
+    isTrailing = tileNums == numRegular[segIdxes]
+    starts[isTrailing] = segEnds[segIdxes[isTrailing]] - outputLength
+    ends = starts + outputLength
+    # Write the regions out as BED text rather than making an Interval for each one.
+    regions = "".join([f"{segChroms[segIdx]}\t{start}\t{end}\n"
+                       for segIdx, start, end in zip(segIdxes.tolist(), starts.tolist(),
+                                                     ends.tolist())])
+    logUtils.debug("Regions created, {0:d} across genome.".format(segIdxes.shape[0]))
+
+    return pybedtools.BedTool(regions, from_string=True)
 
 
 def createTilingRegions(inputLength: int, outputLength: int,
@@ -180,6 +266,29 @@ def createTilingRegions(inputLength: int, outputLength: int,
     return tileSegments(inputLength, outputLength, segments, spacing)
 
 
+# Chromosome lengths for each genome fasta that resize has seen, keyed by file
+# name (not by the FastaFile, so that closed files can be freed).
+_CHROM_LENGTHS_BY_FILE: dict[str, dict[str, int]] = {}
+
+
+def _chromLengths(genome: pysam.FastaFile) -> dict[str, int]:
+    """Get a dict of every chromosome's length, since resize asks for one on every interval.
+
+    :param genome: A FastaFile (the pysam object, not a string)
+    :return: A dict mapping chromosome name to its length. Don't modify it!
+
+    The dict is built once per fasta file, from ``genome.references`` and
+    ``genome.lengths``.
+    """
+    key = genome.filename
+    if isinstance(key, bytes):
+        key = key.decode("utf-8")
+    if (lengths := _CHROM_LENGTHS_BY_FILE.get(key)) is None:
+        lengths = dict(zip(genome.references, genome.lengths))
+        _CHROM_LENGTHS_BY_FILE[key] = lengths
+    return lengths
+
+
 def resize(interval: pybedtools.Interval, mode: str, width: int,
            genome: pysam.FastaFile) -> pybedtools.Interval | Literal[False]:
     """Resize a given interval to a new size.
@@ -222,12 +331,62 @@ def resize(interval: pybedtools.Interval, mode: str, width: int,
             end = start + width
         case _:
             assert False, "Unsupported resize mode: {0:s}".format(mode)
-    if start <= 0 or end >= genome.get_reference_length(interval.chrom):
+    if start <= 0 or end >= _chromLengths(genome)[interval.chrom]:
         return False  # We're off the edge of the chromosome.
     return pybedtools.Interval(interval.chrom, start, end, name=interval.name,
                                score=interval.score, strand=interval.strand)
 
 
+def resizeMany(intervals: list[pybedtools.Interval], mode: str, width: int,
+               genome: pysam.FastaFile) -> list[pybedtools.Interval]:
+    """Resize a whole list of intervals at once.
+
+    :param intervals: The pyBedTools Interval objects to resize.
+    :param mode: One of ``"none"``, ``"center"``, or ``"start"``.
+    :param width: How long the returned Intervals will be.
+    :param genome: A FastaFile (the pysam object, not a string)
+    :return: A list of newly-allocated Intervals of the correct size. Intervals
+        that would run off the edge of a chromosome are left out.
+
+    This gives the same result as calling :py:func:`resize` on each interval and
+    keeping the ones that didn't return ``False``, but the new coordinates and the
+    bounds check are calculated with numpy over all the intervals together.
+    """
+    intervals = list(intervals)
+    chromNames, chromIds = np.unique(np.array([r.chrom for r in intervals], dtype=str),
+                                     return_inverse=True)
+    lengthByName = _chromLengths(genome)
+    chromLengths = np.array([lengthByName[c] for c in chromNames.tolist()], dtype=np.int64)
+    starts = np.fromiter((r.start for r in intervals), dtype=np.int64, count=len(intervals))
+    ends = np.fromiter((r.end for r in intervals), dtype=np.int64, count=len(intervals))
+    match mode:
+        case "none":
+            wrongWidth = np.flatnonzero(ends - starts != width)
+            if wrongWidth.shape[0]:
+                assert False, \
+                       "An input region is not the expected width: {0:s}".format(
+                           str(intervals[wrongWidth[0]]))
+        case "center":
+            starts = (ends + starts) // 2 - width // 2
+            ends = starts + width
+        case "start":
+            starts = starts - width // 2
+            ends = starts + width
+        case _:
+            assert False, "Unsupported resize mode: {0:s}".format(mode)
+    # Anything off the edge of its chromosome is dropped.
+    onChrom = (starts > 0) & (ends < chromLengths[chromIds])
+    return [pybedtools.Interval(r.chrom, start, end, name=r.name, score=r.score,
+                                strand=r.strand)
+            for r, start, end, keep in zip(intervals, starts.tolist(), ends.tolist(),
+                                           onChrom.tolist())
+            if keep]
+
+
+# Above this width, getCounts asks pyBigWig for the sum instead of reading every base.
+_STATS_MIN_WIDTH = 1024
+
+
 def getCounts(interval: pybedtools.Interval, bigwigs: list) -> float:
     """Get the total counts from all bigwigs at a given Interval.
 
@@ -237,14 +396,31 @@ def getCounts(interval: pybedtools.Interval, bigwigs: list) -> float:
         the given interval.
 
     NaN entries in the bigwigs are treated as zero.
+    For intervals wider than ``_STATS_MIN_WIDTH``, the sum is computed inside pyBigWig
+    with ``stats`` so that the values never need to be copied into an array.
     """
-    total = 0
+    total = 0.0
+    useStats = interval.end - interval.start > _STATS_MIN_WIDTH
     for bw in bigwigs:
-        vals = np.nan_to_num(bw.values(interval.chrom, interval.start, interval.end))
-        total += np.sum(vals)
+        if useStats:
+            # stats skips positions with no data, and gives None if there's no data at all.
+            bwSum = bw.stats(interval.chrom, interval.start, interval.end,
+                             type="sum", exact=True)[0]
+            total += bwSum or 0
+        else:
+            vals = bw.values(interval.chrom, interval.start, interval.end, numpy=True)
+            total += np.nansum(vals, dtype=np.float64)
     return total
 
 
+# Lookup table for the sequence checkers: True for the byte values of ACGTacgt.
+_VALID_BASES = np.zeros((256,), dtype=np.bool_)
+_VALID_BASES[np.frombuffer(b"ACGTacgt", dtype=np.uint8)] = True
+
+# How many intervals sequenceCheckerMany fetches from the genome at once.
+_CHECKER_BATCH_SIZE = 4096
+
+
 def sequenceChecker(interval: pybedtools.Interval, genome: pysam.FastaFile) -> bool:
     """For the given interval, does it only contain A, C, G, and T?
 
@@ -254,10 +430,35 @@ def sequenceChecker(interval: pybedtools.Interval, genome: pysam.FastaFile) -> b
         ``False`` otherwise.
     """
     seq = genome.fetch(interval.chrom, interval.start, interval.end)
-    if len(seq.upper().lstrip("ACGT")) != 0:
-        # There were letters that aren't regular bases. (probably Ns)
-        return False
-    return True
+    # Any letters that aren't regular bases (probably Ns) map to False.
+    return bool(_VALID_BASES[np.frombuffer(seq.encode("ascii"), dtype=np.uint8)].all())
+
+
+def sequenceCheckerMany(intervals: list[pybedtools.Interval],
+                        genome: pysam.FastaFile) -> np.ndarray:
+    """Run :py:func:`sequenceChecker` on many intervals at once.
+
+    :param intervals: The intervals to check. They need not all be the same length.
+    :param genome: A FastaFile (pysam object, not a string!).
+    :return: A boolean array with one entry per interval, ``True`` where
+        that interval's sequence matches ``"^[ACGTacgt]*$"``.
+    """
+    ret = np.ones((len(intervals),), dtype=np.bool_)
+    # Work through the intervals in batches so that only one batch of
+    # sequence is in memory at a time.
+    for batchStart in range(0, len(intervals), _CHECKER_BATCH_SIZE):
+        batch = intervals[batchStart:batchStart + _CHECKER_BATCH_SIZE]
+        seqs = [genome.fetch(interval.chrom, interval.start, interval.end)
+                for interval in batch]
+        lengths = np.fromiter((len(seq) for seq in seqs), dtype=np.int64, count=len(seqs))
+        # reduceat can't handle empty intervals, but those are always fine.
+        nonEmpty = np.flatnonzero(lengths)
+        if nonEmpty.shape[0] == 0:
+            continue
+        isValid = _VALID_BASES[np.frombuffer("".join(seqs).encode("ascii"), dtype=np.uint8)]
+        starts = (np.cumsum(lengths) - lengths)[nonEmpty]
+        ret[batchStart + nonEmpty] = np.logical_and.reduceat(isValid, starts)
+    return ret
 
 
 def lineToInterval(line: str) -> pybedtools.Interval | Literal[False]:
@@ -273,6 +474,18 @@ def lineToInterval(line: str) -> pybedtools.Interval | Literal[False]:
     return initInterval
 
 
+# How many queries ParallelCounter gathers up before handing them to a worker.
+_COUNTER_BATCH_SIZE = 1024
+
+# The layout of one query inside a batch. chromId indexes into the list of
+# chromosome names that is sent along with the batch.
+_QUERY_DTYPE = np.dtype([("chromId", np.int32), ("start", np.int64), ("end", np.int64)])
+
+# Numbers each ParallelCounter made in this process, so that counters that run
+# at the same time pin their workers to different CPUs.
+_COUNTER_IDS = itertools.count()
+
+
 class ParallelCounter:
     """A class that queues up getCounts() jobs and runs them in parallel.
 
@@ -280,6 +493,11 @@ class ParallelCounter:
 
     :param bigwigNames: The name of the bigwig files to read from
     :param numThreads: How many parallel workers should be used?
+
+    Queries are sent to the workers in batches of ``_COUNTER_BATCH_SIZE``, packed
+    into a single numpy array, so that the queue doesn't pickle every region
+    separately. Results come back a batch at a time too, and are handed out
+    from their batch arrays rather than being split up as they arrive.
     """
 
     def __init__(self, bigwigNames: list[str], numThreads: int):
@@ -288,12 +506,26 @@ class ParallelCounter:
         self.inQueue = multiprocessing.Queue()
         self.outQueue = multiprocessing.Queue()
         self.inFlight = 0
+        # Batches of results, as (counts, idxes), that have come back from the workers.
         self.outDeque = deque()
         self.numInDeque = 0
+        # How many results from the oldest batch in outDeque were already returned.
+        self._resultPos = 0
+        # The batch that is currently being filled.
+        self._batch = np.zeros((_COUNTER_BATCH_SIZE,), dtype=_QUERY_DTYPE)
+        self._batchIdxes = []
+        self._batchChroms = {}
+        # The idx values of every batch that has been sent, keyed by batch number.
+        self._sentIdxes = {}
+        self._numBatches = 0
+        # Where this counter's workers start in the list of allowed CPUs. Mixing in
+        # the pid keeps separate prepareBed jobs on one node from all starting at
+        # the lowest CPU.
+        cpuOffset = (os.getpid() + next(_COUNTER_IDS)) * numThreads
         self.threads = [multiprocessing.Process(
             target=_counterThread,
-            args=(bigwigNames, self.inQueue, self.outQueue))
-            for _ in range(numThreads)]
+            args=(bigwigNames, self.inQueue, self.outQueue, cpuOffset + workerId))
+            for workerId in range(numThreads)]
         [x.start() for x in self.threads]  # pylint: disable=expression-not-assigned
 
     def addQuery(self, query: tuple[str, int, int], idx: Any) -> None:
@@ -302,12 +534,71 @@ class ParallelCounter:
         :param query: A tuple of (chromosome, start, end) giving the region to look at.
         :param idx: An index that will be returned with the results.
         """
-        self.inQueue.put(query + (idx,), timeout=constants.QUEUE_TIMEOUT)
+        chrom, start, end = query
+        if chrom not in self._batchChroms:
+            self._batchChroms[chrom] = len(self._batchChroms)
+        self._batch[len(self._batchIdxes)] = (self._batchChroms[chrom], start, end)
+        self._batchIdxes.append(idx)
         self.inFlight += 1
-        while not self.outQueue.empty():
-            self.outDeque.appendleft(self.outQueue.get(timeout=constants.QUEUE_TIMEOUT))
-            self.numInDeque += 1
-            self.inFlight -= 1
+        if len(self._batchIdxes) == _COUNTER_BATCH_SIZE:
+            self._sendBatch()
+            while not self.outQueue.empty():
+                self._receiveBatch()
+
+    def addQueries(self, chroms: list[str], starts: np.ndarray, ends: np.ndarray,
+                   idxes: list) -> None:
+        """Add many regions to the task list at once.
+
+        :param chroms: The chromosome of each region.
+        :param starts: The start coordinate of each region.
+        :param ends: The end coordinate of each region.
+        :param idxes: For each region, an index that will be returned with its result.
+
+        This is equivalent to calling :py:meth:`addQuery` on each region, but the
+        regions are packed into batches with numpy instead of one at a time.
+        """
+        self._sendBatch()
+        chromNames, chromIds = np.unique(np.asarray(chroms, dtype=str), return_inverse=True)
+        chromNames = chromNames.tolist()
+        queries = np.empty((chromIds.shape[0],), dtype=_QUERY_DTYPE)
+        queries["chromId"] = chromIds
+        queries["start"] = starts
+        queries["end"] = ends
+        idxes = list(idxes)
+        self.inFlight += len(idxes)
+        for batchStart in range(0, queries.shape[0], _COUNTER_BATCH_SIZE):
+            batchEnd = batchStart + _COUNTER_BATCH_SIZE
+            self._putBatch(chromNames, queries[batchStart:batchEnd], idxes[batchStart:batchEnd])
+            while not self.outQueue.empty():
+                self._receiveBatch()
+
+    def _sendBatch(self) -> None:
+        """Send the queries that have been gathered so far to the workers."""
+        if not self._batchIdxes:
+            return
+        self._putBatch(list(self._batchChroms), self._batch[:len(self._batchIdxes)].copy(),
+                       self._batchIdxes)
+        self._batchIdxes = []
+        self._batchChroms = {}
+
+    def _putBatch(self, chromNames: list[str], queries: np.ndarray, idxes: list) -> None:
+        """Put one batch of queries on the input queue.
+
+        :param chromNames: The chromosome names that the chromId field refers to.
+        :param queries: An array with dtype ``_QUERY_DTYPE``.
+        :param idxes: The idx for each query, kept here until the results come back.
+        """
+        self._sentIdxes[self._numBatches] = idxes
+        self.inQueue.put((self._numBatches, chromNames, queries),
+                         timeout=constants.QUEUE_TIMEOUT)
+        self._numBatches += 1
+
+    def _receiveBatch(self) -> None:
+        """Wait for one batch of results and move it into outDeque."""
+        batchNum, counts = self.outQueue.get(timeout=constants.QUEUE_TIMEOUT)
+        self.outDeque.appendleft((counts, self._sentIdxes.pop(batchNum)))
+        self.numInDeque += counts.shape[0]
+        self.inFlight -= counts.shape[0]
 
     def done(self):
         """Wrap up the show - close the child threads."""
@@ -325,35 +616,71 @@ class ParallelCounter:
         values.
         """
         if self.inFlight and self.numInDeque == 0:
-            self.outDeque.appendleft(self.outQueue.get(timeout=constants.QUEUE_TIMEOUT))
-            self.numInDeque += 1
-            self.inFlight -= 1
+            # The last few queries may still be waiting for their batch to fill up.
+            self._sendBatch()
+            self._receiveBatch()
+        counts, idxes = self.outDeque[-1]
+        ret = (counts[self._resultPos], idxes[self._resultPos])
+        self._resultPos += 1
+        if self._resultPos == counts.shape[0]:
+            self.outDeque.pop()
+            self._resultPos = 0
         self.numInDeque -= 1
-        return self.outDeque.pop()
+        return ret
+
+    def getResults(self, out: np.ndarray, pbar: Any = None) -> None:
+        """Wait for every outstanding query and store the results in an array.
+
+        :param out: An array that will be filled with ``out[idx] = counts`` for
+            every query that hasn't been returned by :py:meth:`getResult` yet.
+            For this to work, the idx values given to addQuery must be integers.
+        :param pbar: (Optional) A progress bar from :py:func:`~wrapTqdm`. It will be
+            updated as each batch of results arrives.
+
+        Each batch of results is scattered into ``out`` with one numpy assignment,
+        so there is no per-region work in Python.
+        """
+        self._sendBatch()
+        while self.outDeque or self.inFlight:
+            if not self.outDeque:
+                self._receiveBatch()
+            counts, idxes = self.outDeque.pop()
+            out[idxes[self._resultPos:]] = counts[self._resultPos:]
+            if pbar is not None:
+                pbar.update(counts.shape[0] - self._resultPos)
+            self._resultPos = 0
+        self.numInDeque = 0
 
 
 def _counterThread(bigwigFnames: list[str], inQueue: multiprocessing.Queue,
-                   outQueue: multiprocessing.Queue) -> None:
+                   outQueue: multiprocessing.Queue, cpuSlot: int) -> None:
     """Thread to sum up regions of the bigwigs.
 
     :param bigwigFnames: A list of file names to open.
     :param inQueue: The input queue, where queries will come from.
     :param outQueue: Where the calculated counts should be put.
+    :param cpuSlot: Which of the allowed CPUs to run on, wrapping around if
+        it is past the end of the list.
     :return: None, but does put results in outQueue.
 
-    The runner, :py:class:`~ParallelCounter`, will inject regions
-    in the format ``tuple[str, int, int, Any]``, which contains, in order,
+    Where the OS supports it, the worker pins itself to one of the CPUs this
+    process is allowed to use, so that it doesn't migrate away from its
+    bigwig buffers.
+
+    The runner, :py:class:`~ParallelCounter`, will inject batches of regions
+    in the format ``tuple[int, list[str], np.ndarray]``, which contains, in order,
 
-    1. Chromosome (``str``), the chromosome that the region is on.
-    2. Start (``int``), the start coordinate, 0-based, inclusive.
-    3. End (``int``), the end coordinate, 0-based, exclusive.
-    4. Index, which will be passed back with the result.
+    1. Batch number (``int``), which will be passed back with the results.
+    2. Chromosome names (``list[str]``), the chromosomes used in this batch.
+    3. Queries, an array with dtype ``_QUERY_DTYPE``. Each entry holds the
+       index of its chromosome in the list of names, the start coordinate
+       (0-based, inclusive), and the end coordinate (0-based, exclusive).
 
     The results put counts data into ``outQueue``, with format
-    ``tuple[int, Any]``, containing:
+    ``tuple[int, np.ndarray]``, containing:
 
-    1. Total counts, a float.
-    2. Index, which is straight from the input queue.
+    1. Batch number, which is straight from the input queue.
+    2. Total counts, a float64 array with one entry per query.
 
     The total counts for a region is specified by::
 
@@ -364,23 +691,22 @@ def _counterThread(bigwigFnames: list[str], inQueue: multiprocessing.Queue,
             return total
 
     """
+    if hasattr(os, "sched_setaffinity"):
+        # Only choose from the CPUs we were given, since a job scheduler may
+        # have restricted us to a subset of the machine.
+        allowedCpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {allowedCpus[cpuSlot % len(allowedCpus)]})
     bwFiles = [pyBigWig.open(fname) for fname in bigwigFnames]
-    outDeque = deque()
-    inDeque = 0
     while True:
-        query = inQueue.get(timeout=constants.QUEUE_TIMEOUT)
-        match query:
-            case (chrom, start, end, idx):
-                r = getCounts(pybedtools.Interval(chrom, start, end), bwFiles)
-                outDeque.appendleft((r, idx))
-                inDeque += 1
-                while outQueue.empty and inDeque > 0:
-                    outQueue.put(outDeque.pop())
-                    inDeque -= 1
+        batch = inQueue.get(timeout=constants.QUEUE_TIMEOUT)
+        match batch:
+            case (batchNum, chromNames, queries):
+                counts = np.empty((queries.shape[0],), dtype=np.float64)
+                for i, (chromId, start, end) in enumerate(queries.tolist()):
+                    counts[i] = getCounts(pybedtools.Interval(chromNames[chromId], start, end),
+                                          bwFiles)
+                outQueue.put((batchNum, counts), timeout=constants.QUEUE_TIMEOUT)
             case None:
                 break
-    while inDeque:
-        outQueue.put(outDeque[-1], timeout=constants.QUEUE_TIMEOUT)
-        inDeque -= 1
     [x.close() for x in bwFiles]  # pylint: disable=expression-not-assigned
 # Copyright 2022, 2023, 2024 Charles McAnany. This file is part of BPReveal. BPReveal is free software: You can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 2 of the License, or (at your option) any later version. BPReveal is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with BPReveal. If not, see <https://www.gnu.org/licenses/>.  # noqa
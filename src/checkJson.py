@@ -5,7 +5,7 @@ Useful before you submit a big job!
 """
 import json
 import argparse
-import jsonschema
+import sys
 from bpreveal.schema import schemaMap
 
 
@@ -15,13 +15,66 @@ def getParser():
     parser.add_argument("-s", "--schema-name",
         help="The name of the schema, like prepareBed. If omitted, check all schemas.",
         dest="schemaName")
-    parser.add_argument("jsons", help="The name of the json files to validate.", nargs="+")
+    parser.add_argument("--serve",
+        help="Keep running and read json file names from stdin, one per line, "
+             "printing the result for each one as soon as it is checked.",
+        action="store_true")
+    parser.add_argument("jsons", help="The name of the json files to validate.", nargs="*")
     return parser
 
 
+def matchingSchemas(testJson: dict) -> list[str]:
+    """Get the names of all the schemas that testJson satisfies."""
+    # is_valid stops at the first mismatch instead of building
+    # a full ValidationError that we would just throw away.
+    return [schemaName for schemaName, schema in schemaMap.items()
+            if schema.is_valid(testJson)]
+
+
+def serve(schemaName: str | None):
+    """Check each json file named on stdin until stdin is closed.
+
+    The schema module is only imported once, so this is much faster than
+    starting checkJson for every file.
+    """
+    for line in sys.stdin:
+        jsonFname = line.strip()
+        if not jsonFname:
+            continue
+        try:
+            with open(jsonFname, "r") as fp:
+                testJson = json.load(fp)
+        except (OSError, ValueError) as e:
+            # A bad file shouldn't take the whole server down with it.
+            # (json.JSONDecodeError is a ValueError.)
+            print(jsonFname, "FAILED to load:", str(e))
+            sys.stdout.flush()
+            continue
+        if schemaName is not None:
+            # Only the first error is reported, so don't go looking for the rest.
+            firstError = next(schemaMap[schemaName].iter_errors(testJson), None)
+            if firstError is None:
+                print(jsonFname, "Validated.")
+            else:
+                print(jsonFname, "FAILED to validate:", firstError.message)
+        else:
+            matches = matchingSchemas(testJson)
+            if matches:
+                print(jsonFname, "→", " ".join(matches))
+            else:
+                print(jsonFname + " Failed to validate")
+        sys.stdout.flush()
+
+
 def main():
     """Run the checks."""
-    args = getParser().parse_args()
+    parser = getParser()
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.schemaName)
+        return
+    if not args.jsons:
+        parser.error("Give at least one json file to check, or use --serve.")
     fnameByMatchedSchema = {}
     failedFnames = []
     for jsonFname in args.jsons:
@@ -31,19 +84,12 @@ def main():
             schemaMap[args.schemaName].validate(testJson)
             print(jsonFname, "Validated.")
         else:
-            anyPassed = False
-            for schemaName, schema in schemaMap.items():
-                try:
-                    schema.validate(testJson)
-                    # print("    " + jsonFname + " →", schema)
-                    anyPassed = True
-                    if schemaName not in fnameByMatchedSchema:
-                        fnameByMatchedSchema[schemaName] = []
-                    fnameByMatchedSchema[schemaName].append(jsonFname)
-
-                except jsonschema.ValidationError:
-                    pass
-            if not anyPassed:
+            matches = matchingSchemas(testJson)
+            for schemaName in matches:
+                if schemaName not in fnameByMatchedSchema:
+                    fnameByMatchedSchema[schemaName] = []
+                fnameByMatchedSchema[schemaName].append(jsonFname)
+            if not matches:
                 print(jsonFname + " Failed to validate")
     for schemaName, matches in fnameByMatchedSchema.items():
         print("    " + schemaName + "")
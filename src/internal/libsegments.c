@@ -0,0 +1,47 @@
+/*
+ * C implementation of the search for runs of valid bases,
+ * used by bedUtils to find the parts of a genome that don't contain N.
+ *
+ * Both functions walk the mask exactly once, so no temporary arrays are needed
+ * no matter how long the chromosome is. Call countSegments first to find out how
+ * big the output arrays must be, then findSegments to fill them.
+ */
+
+void countSegments(unsigned char *restrict valid, int length, int *numSegments){
+    /**
+    * valid is a (length,) array that is nonzero wherever a base may be used.
+    * Stores the number of maximal runs of nonzero values in numSegments[0].
+    */
+    int count = (length > 0) && (valid[0] != 0);
+    for(int i = 1; i < length; i++){
+        count += (valid[i] != 0) & (valid[i - 1] == 0);
+    }
+    numSegments[0] = count;
+}
+
+void findSegments(unsigned char *restrict valid, int length, int numSegments,
+                  int *restrict starts, int *restrict ends){
+    /**
+    * valid is a (length,) array that is nonzero wherever a base may be used.
+    * starts and ends are (numSegments,) arrays, where numSegments comes from
+    * countSegments.
+    * Implements the following:
+    * for each maximal run valid[start:end] of nonzero values, in order,
+    *   starts[segment] = start
+    *   ends[segment] = end
+    * so the ends are exclusive, just like a bed file.
+    */
+    int i = 0;
+    for(int segment = 0; segment < numSegments; segment++){
+        while(i < length && valid[i] == 0){
+            i++;
+        }
+        starts[segment] = i;
+        while(i < length && valid[i] != 0){
+            i++;
+        }
+        // If the last run goes to the end of the chromosome, i is length here.
+        ends[segment] = i;
+    }
+}
+/*Copyright 2022, 2023, 2024 Charles McAnany. This file is part of BPReveal. BPReveal is free software: You can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 2 of the License, or (at your option) any later version. BPReveal is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with BPReveal. If not, see <https://www.gnu.org/licenses/>.*/
@@ -29,38 +29,68 @@
 /*
  *    ushuffle.h - uShuffle library header
  *    Mon Apr 23 14:35:21 MDT 2007
+ *
+ *    Modified for BPReveal: all of the state that used to live in global
+ *    variables is now kept in a ushuffle_ctx_t that belongs to one call, so
+ *    any number of threads can shuffle at once without a lock.
  */
 
-void shuffle(const char *s, char *t, int l, int k);
-void shuffle1(const char *s, int l, int k);
-void shuffle2(char *t);
-
-typedef long (*randfunc_t)();
-void set_randfunc(randfunc_t randfunc);
-
-void permutec(char *t, int l);    /* for use by test.c */
-
 #include <math.h>
+#include <stdint.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
-/* set random function */
 
-#if defined(_WIN32) || defined(_WIN64)
-    static randfunc_t randfunc = rand;
-#else
-    static randfunc_t randfunc = random;
-#endif
+/* random number generator */
+
+/* This is the additive feedback generator that glibc uses for random(), with
+ * the same seeding, so a given seed produces exactly the shuffles it did when
+ * this library called srandom() and random(). Unlike random(), its state is
+ * carried in the context, not shared by the whole process. */
+
+#define RNG_DEG 31
+#define RNG_SEP 3
+
+typedef struct rng_t {
+    uint32_t state[RNG_DEG];
+    int front;
+    int rear;
+} rng_t;
 
-void set_randfunc(randfunc_t func) {
-    randfunc = func;
+static long rngNext(rng_t *rng) {
+    uint32_t val;
+
+    rng->state[rng->front] += rng->state[rng->rear];
+    val = rng->state[rng->front];
+    rng->front = (rng->front + 1) % RNG_DEG;
+    rng->rear = (rng->rear + 1) % RNG_DEG;
+    return (val >> 1) & 0x7fffffff;
 }
 
-/* global variables for the Euler algorithm */
+static void rngSeed(rng_t *rng, unsigned int seed) {
+    int32_t word;
+    int i;
+
+    if (seed == 0)
+        seed = 1;
+    rng->state[0] = seed;
+    word = seed;
+    for (i = 1; i < RNG_DEG; i++) {
+        /* 16807 * word % 2147483647, without overflowing 31 bits. */
+        long hi = word / 127773;
+        long lo = word % 127773;
+        word = 16807 * lo - 2836 * hi;
+        if (word < 0)
+            word += 2147483647;
+        rng->state[i] = word;
+    }
+    rng->front = RNG_SEP;
+    rng->rear = 0;
+    for (i = 0; i < 10 * RNG_DEG; i++)
+        rngNext(rng);
+}
 
-static const char *s_ = NULL;
-static int l_ = 0;
-static int k_ = 0;
+/* per-call state for the Euler algorithm */
 
 typedef struct vertex {
     int *indices;
@@ -70,10 +100,26 @@ typedef struct vertex {
     int i_sequence;
 } vertex;
 
-static vertex *vertices = NULL;
-static int n_vertices;
-static int *indices = NULL;
-static int root;
+typedef struct hentry {
+    struct hentry *next;
+    int i_sequence;
+    int i_vertices;
+} hentry;
+
+typedef struct ushuffle_ctx_t {
+    const char *s_;
+    int l_;
+    int k_;
+    vertex *vertices;
+    int n_vertices;
+    int *indices;
+    int root;
+    hentry *entries;
+    hentry **htable;
+    int htablesize;
+    double hmagic;
+    rng_t rng;
+} ushuffle_ctx_t;
 
 /* memory utility */
 
@@ -87,89 +133,90 @@ static void *malloc0(size_t size) {
     return memset(mem, 0, size);
 }
 
-/* hashtable utility */
+static void ctxInit(ushuffle_ctx_t *ctx, unsigned int seed) {
+    memset(ctx, 0, sizeof(ushuffle_ctx_t));
+    rngSeed(&ctx->rng, seed);
+}
 
-typedef struct hentry {
-    struct hentry *next;
-    int i_sequence;
-    int i_vertices;
-} hentry;
+static void ctxCleanup(ushuffle_ctx_t *ctx) {
+    free(ctx->vertices);
+    ctx->vertices = NULL;
+    free(ctx->indices);
+    ctx->indices = NULL;
+}
 
-static hentry *entries = NULL;
-static hentry **htable = NULL;
-static int htablesize = 0;
-static double hmagic;
+/* hashtable utility */
 
-static int hcode(int i_sequence) {
+static int hcode(ushuffle_ctx_t *ctx, int i_sequence) {
     double f = 0.0;
     int i;
 
-    for (i = 0; i < k_ - 1; i++) {
-        f += s_[i_sequence + i];
-        f *= hmagic;
+    for (i = 0; i < ctx->k_ - 1; i++) {
+        f += ctx->s_[i_sequence + i];
+        f *= ctx->hmagic;
     }
     if (f < 0.0)
         f = -f;
-    return (int) (htablesize * f) % htablesize;
+    return (int) (ctx->htablesize * f) % ctx->htablesize;
 }
 
-static void hinit(int size) {
-    entries = malloc0(size * sizeof(hentry));
-    htable = malloc0(size * sizeof(hentry *));
-    htablesize = size;
-    hmagic = (sqrt(5.0) - 1.0) / 2.0;
+static void hinit(ushuffle_ctx_t *ctx, int size) {
+    ctx->entries = malloc0(size * sizeof(hentry));
+    ctx->htable = malloc0(size * sizeof(hentry *));
+    ctx->htablesize = size;
+    ctx->hmagic = (sqrt(5.0) - 1.0) / 2.0;
 }
 
-static void hcleanup() {
-    free(entries);
-    entries = NULL;
-    free(htable);
-    htable = NULL;
-    htablesize = 0;
+static void hcleanup(ushuffle_ctx_t *ctx) {
+    free(ctx->entries);
+    ctx->entries = NULL;
+    free(ctx->htable);
+    ctx->htable = NULL;
+    ctx->htablesize = 0;
 }
 
-static void hinsert(int i_sequence) {
-    int code = hcode(i_sequence);
-    hentry *e, *e2 = &entries[i_sequence];
+static void hinsert(ushuffle_ctx_t *ctx, int i_sequence) {
+    int code = hcode(ctx, i_sequence);
+    hentry *e, *e2 = &ctx->entries[i_sequence];
 
-    for (e = htable[code]; e; e = e->next)
-        if (strncmp(&s_[e->i_sequence], &s_[i_sequence], k_ - 1) == 0) {
+    for (e = ctx->htable[code]; e; e = e->next)
+        if (strncmp(&ctx->s_[e->i_sequence], &ctx->s_[i_sequence], ctx->k_ - 1) == 0) {
             e2->i_sequence = e->i_sequence;
             e2->i_vertices = e->i_vertices;
             return;
         }
     e2->i_sequence = i_sequence;
-    e2->i_vertices = n_vertices++;
-    e2->next = htable[code];
-    htable[code] = e2;
+    e2->i_vertices = ctx->n_vertices++;
+    e2->next = ctx->htable[code];
+    ctx->htable[code] = e2;
 }
 
 /* the Euler algorithm */
 
-void shuffle1(const char *s, int l, int k) {
+static void shuffle1(ushuffle_ctx_t *ctx, const char *s, int l, int k) {
     int i, j, n_lets;
 
-    s_ = s;
-    l_ = l;
-    k_ = k;
-    if (k_ >= l_ || k_ <= 1)    /* two special cases */
+    ctx->s_ = s;
+    ctx->l_ = l;
+    ctx->k_ = k;
+    if (ctx->k_ >= ctx->l_ || ctx->k_ <= 1)    /* two special cases */
         return;
 
     /* use hashtable to find distinct vertices */
-    n_lets = l_ - k_ + 2;    /* number of (k-1)-lets */
-    n_vertices = 0;
-    hinit(n_lets);
+    n_lets = ctx->l_ - ctx->k_ + 2;    /* number of (k-1)-lets */
+    ctx->n_vertices = 0;
+    hinit(ctx, n_lets);
     for (i = 0; i < n_lets; i++)
-        hinsert(i);
-    root = entries[n_lets - 1].i_vertices;    /* the last let */
-    if (vertices)
-        free(vertices);
-    vertices = malloc0(n_vertices * sizeof(vertex));
+        hinsert(ctx, i);
+    ctx->root = ctx->entries[n_lets - 1].i_vertices;    /* the last let */
+    if (ctx->vertices)
+        free(ctx->vertices);
+    ctx->vertices = malloc0(ctx->n_vertices * sizeof(vertex));
 
     /* set i_sequence and n_indices for each vertex */
     for (i = 0; i < n_lets; i++) {    /* for each let */
-        hentry *ev = &entries[i];
-        vertex *v = &vertices[ev->i_vertices];
+        hentry *ev = &ctx->entries[i];
+        vertex *v = &ctx->vertices[ev->i_vertices];
 
         v->i_sequence = ev->i_sequence;
         if (i < n_lets - 1)    /* not the last let */
@@ -177,73 +224,74 @@ void shuffle1(const char *s, int l, int k) {
     }
 
     /* distribute indices for each vertex */
-    if (indices)
-        free(indices);
-    indices = malloc0((n_lets - 1) * sizeof(int));
+    if (ctx->indices)
+        free(ctx->indices);
+    ctx->indices = malloc0((n_lets - 1) * sizeof(int));
     j = 0;
-    for (i = 0; i < n_vertices; i++) {    /* for each vertex */
-        vertex *v = &vertices[i];
+    for (i = 0; i < ctx->n_vertices; i++) {    /* for each vertex */
+        vertex *v = &ctx->vertices[i];
 
-        v->indices = indices + j;
+        v->indices = ctx->indices + j;
         j += v->n_indices;
     }
 
     /* populate indices for each vertex */
     for (i = 0; i < n_lets - 1; i++) {    /* for each edge */
-        hentry *eu = &entries[i];
-        hentry *ev = &entries[i + 1];
-        vertex *u = &vertices[eu->i_vertices];
+        hentry *eu = &ctx->entries[i];
+        hentry *ev = &ctx->entries[i + 1];
+        vertex *u = &ctx->vertices[eu->i_vertices];
 
         u->indices[u->i_indices++] = ev->i_vertices;
     }
-    hcleanup();
+    hcleanup(ctx);
 }
 
-void permutec(char *t, int l) {
+static void permutec(ushuffle_ctx_t *ctx, char *t, int l) {
     int i, j;
     char tmp;
 
     for (i = l - 1; i > 0; i--) {
-        j = (*randfunc)() % (i + 1);
+        j = rngNext(&ctx->rng) % (i + 1);
         tmp = t[i]; t[i] = t[j]; t[j] = tmp;    /* swap */
     }
 }
 
-static void permutei(int *t, int l) {
+static void permutei(ushuffle_ctx_t *ctx, int *t, int l) {
     int i, j;
     int tmp;
 
     for (i = l - 1; i > 0; i--) {
-        j = (*randfunc)() % (i + 1);
+        j = rngNext(&ctx->rng) % (i + 1);
         tmp = t[i]; t[i] = t[j]; t[j] = tmp;    /* swap */
     }
 }
 
-void shuffle2(char *t) {
+static void shuffle2(ushuffle_ctx_t *ctx, char *t) {
     vertex *u, *v;
+    vertex *vertices = ctx->vertices;
     int i, j;
 
     /* exact copy case */
-    if (k_ >= l_) {
-        strncpy(t, s_, l_);
+    if (ctx->k_ >= ctx->l_) {
+        strncpy(t, ctx->s_, ctx->l_);
         return;
     }
 
     /* simple permutation case */
-    if (k_ <= 1) {
-        strncpy(t, s_, l_);
-        permutec(t, l_);
+    if (ctx->k_ <= 1) {
+        strncpy(t, ctx->s_, ctx->l_);
+        permutec(ctx, t, ctx->l_);
         return;
     }
 
     /* the Wilson algorithm for random arborescence */
-    for (i = 0; i < n_vertices; i++)
+    for (i = 0; i < ctx->n_vertices; i++)
         vertices[i].intree = 0;
-    vertices[root].intree = 1;
-    for (i = 0; i < n_vertices; i++) {
+    vertices[ctx->root].intree = 1;
+    for (i = 0; i < ctx->n_vertices; i++) {
         u = &vertices[i];
         while (!u->intree) {
-            u->next = (*randfunc)() % u->n_indices;
+            u->next = rngNext(&ctx->rng) % u->n_indices;
             u = &vertices[u->indices[u->next]];
         }
         u = &vertices[i];
@@ -254,66 +302,97 @@ void shuffle2(char *t) {
     }
 
     /* shuffle indices to prepare for walk */
-    for (i = 0; i < n_vertices; i++) {
+    for (i = 0; i < ctx->n_vertices; i++) {
         u = &vertices[i];
-        if (i != root) {
+        if (i != ctx->root) {
             j = u->indices[u->n_indices - 1];    /* swap the last one */
             u->indices[u->n_indices - 1] = u->indices[u->next];
             u->indices[u->next] = j;
-            permutei(u->indices, u->n_indices - 1);    /* permute the rest */
+            permutei(ctx, u->indices, u->n_indices - 1);    /* permute the rest */
         } else
-            permutei(u->indices, u->n_indices);
+            permutei(ctx, u->indices, u->n_indices);
         u->i_indices = 0;    /* reset to zero before walk */
     }
 
     /* walk the graph */
-    strncpy(t, s_, k_ - 1);    /* the first let remains the same */
+    strncpy(t, ctx->s_, ctx->k_ - 1);    /* the first let remains the same */
     u = &vertices[0];
-    i = k_ - 1;
+    i = ctx->k_ - 1;
     while (u->i_indices < u->n_indices) {
         v = &vertices[u->indices[u->i_indices]];
-        j = v->i_sequence + k_ - 2;
-        t[i++] = s_[j];
+        j = v->i_sequence + ctx->k_ - 2;
+        t[i++] = ctx->s_[j];
         u->i_indices++;
         u = v;
     }
 }
 
-void shuffle(const char *s, char *t, int l, int k) {
-    shuffle1(s, l, k);
-    shuffle2(t);
-}
-
-
-
-void seedRng(unsigned int seed){
-    srandom(seed);
-}
-
-void initialize(){
-    //Use the libc random function.
-    set_randfunc(random);
-}
-
-void shuffleStr(const char *input, char *output, int length, int kmerSize, int numShuffles){
+static void shuffleWithCtx(ushuffle_ctx_t *ctx, const char *input, char *output,
+                           int length, int kmerSize, int numShuffles){
     int i;
-    shuffle1(input, length, kmerSize);
+    shuffle1(ctx, input, length, kmerSize);
     for(i = 0; i < numShuffles; i++){
-        shuffle2(output + length * i * sizeof(char));
+        shuffle2(ctx, output + length * i * sizeof(char));
     }
 }
 
+void shuffleStr(const char *input, char *output, int length, int kmerSize, int numShuffles,
+                int seed){
+    /**
+    * Shuffle input numShuffles times, preserving its kmerSize-mer counts, and
+    * write the results end to end in output. seed determines the shuffles
+    * completely, and no state is kept between calls.
+    */
+    ushuffle_ctx_t ctx;
+    ctxInit(&ctx, (unsigned int) seed);
+    shuffleWithCtx(&ctx, input, output, length, kmerSize, numShuffles);
+    ctxCleanup(&ctx);
+}
+
 #define A_OHE (1<<0)
 #define C_OHE (1<<1)
 #define G_OHE (1<<2)
 #define T_OHE (1<<3)
 
+/* For each of the 16 ways to pack a four-letter position, the four bytes of
+ * its one-hot encoding. Unpacking is then one four-byte copy per position. */
+static const char UNPACK_DNA[16][4] = {
+    {0, 0, 0, 0}, {1, 0, 0, 0}, {0, 1, 0, 0}, {1, 1, 0, 0},
+    {0, 0, 1, 0}, {1, 0, 1, 0}, {0, 1, 1, 0}, {1, 1, 1, 0},
+    {0, 0, 0, 1}, {1, 0, 0, 1}, {0, 1, 0, 1}, {1, 1, 0, 1},
+    {0, 0, 1, 1}, {1, 0, 1, 1}, {0, 1, 1, 1}, {1, 1, 1, 1}};
+
+static void packDNA(const char *restrict input, char *restrict packed, int length){
+    int pos;
+    for(pos = 0; pos < length; pos++){
+        const char *row = input + pos * 4;
+        packed[pos] = (row[0] ? A_OHE : 0) | (row[1] ? C_OHE : 0)
+                    | (row[2] ? G_OHE : 0) | (row[3] ? T_OHE : 0);
+    }
+}
+
+static void unpackDNA(const char *restrict packed, char *restrict output, int count){
+    int pos;
+    for(pos = 0; pos < count; pos++){
+        memcpy(output + pos * 4, UNPACK_DNA[packed[pos] & 0xF], 4);
+    }
+}
+
 void shuffleOhe(const char *input, char * output, int alphabetSize,
-                int length, int kmerSize, int numShuffles){
+                int length, int kmerSize, int numShuffles, int seed){
     //The array is in row-major order, so we need to pack it into a temporary string.
     char *inputString = malloc(length * sizeof(char));
     char *outputString = malloc(length * numShuffles * sizeof(char));
     int pos, outputIdx, letter;
+    if(alphabetSize == 4){
+        // DNA is by far the common case, so it gets a table-driven pack and unpack.
+        packDNA(input, inputString, length);
+        shuffleStr(inputString, outputString, length, kmerSize, numShuffles, seed);
+        unpackDNA(outputString, output, length * numShuffles);
+        free(inputString);
+        free(outputString);
+        return;
+    }
     for(pos = 0; pos < length; pos++){
         inputString[pos] = 0;
         for(letter = 0; letter < alphabetSize; letter++){
@@ -321,9 +400,7 @@ void shuffleOhe(const char *input, char * output, int alphabetSize,
             inputString[pos] += letterPresent << letter;
         }
     }
-    for(int c = 0; c < length; c++){
-    }
-    shuffleStr(inputString, outputString, length, kmerSize, numShuffles);
+    shuffleStr(inputString, outputString, length, kmerSize, numShuffles, seed);
     //Now it's time to unpack the shuffled string to be one-hot encoded.
     for(outputIdx = 0; outputIdx < numShuffles; outputIdx++){
         int oheOffset = outputIdx * length * alphabetSize;
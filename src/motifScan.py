@@ -137,6 +137,9 @@ def main(config: dict):
         tsvFname = None
         if "seqlets-tsv" in cutoffConfig:
             tsvFname = cutoffConfig["seqlets-tsv"]
+        numThreads = 1
+        if "num-threads" in cutoffConfig:
+            numThreads = cutoffConfig["num-threads"]
         scanPatternDict = motifUtils.seqletCutoffs(
             cutoffConfig["modisco-h5"],
             cutoffConfig["modisco-contrib-h5"],
@@ -147,7 +150,8 @@ def main(config: dict):
             cutoffConfig["trim-threshold"],
             cutoffConfig["trim-padding"],
             cutoffConfig["background-probs"],
-            tsvFname
+            tsvFname,
+            numThreads
         )
         logUtils.info("Analysis complete.")
         if "quantile-json" in cutoffConfig:
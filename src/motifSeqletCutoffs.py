@@ -84,6 +84,11 @@ background-probs
     This may also be a string naming a genome, such as ``sacCer3``.
     BPReveal knows about danRer11, hg38, mm10, dm6, and sacCer3.
 
+num-threads
+    (Optional) How many patterns to analyze at once. Every pattern's seqlets
+    are independent, so each one can be worked on in a separate process.
+    Default: 1
+
 patterns
     May be either a pattern spec (see below) or the string "all", in which case
     every pattern will be used to scan.
@@ -133,6 +138,9 @@ def main(config: dict):
     tsvFname = None
     if "seqlets-tsv" in config:
         tsvFname = config["seqlets-tsv"]
+    numThreads = 1
+    if "num-threads" in config:
+        numThreads = config["num-threads"]
     scanPatternDict = motifUtils.seqletCutoffs(config["modisco-h5"],
                                                config["modisco-contrib-h5"],
                                                config["patterns"],
@@ -142,11 +150,12 @@ def main(config: dict):
                                                config["trim-threshold"],
                                                config["trim-padding"],
                                                config["background-probs"],
-                                               tsvFname
+                                               tsvFname,
+                                               numThreads
                                                )
     logUtils.info("Analysis complete.")
     if "quantile-json" in config:
-        logUtils.info("Saving pattern json.")
+        logUtils.info("Saving pattern json to %s.", config["quantile-json"])
         with open(config["quantile-json"], "w") as fp:
             json.dump(scanPatternDict, fp, indent=4)
 
@@ -37,6 +37,14 @@ except ModuleNotFoundError:
                   " in the src/ directory.")
     raise
 
+# Chunk cache settings for reading modisco files. Each pattern's datasets are
+# read in turn, and a large cache (with a prime number of slots to keep hash
+# collisions down) keeps chunks shared between patterns from being
+# decompressed more than once.
+_MODISCO_RDCC_NBYTES = 128 * 1024 * 1024
+_MODISCO_RDCC_NSLOTS = 1_000_003
+_MODISCO_RDCC_W0 = 0.75
+
 
 def arrayQuantileMap(standard: npt.NDArray, samples: npt.NDArray,
                      standardSorted: bool = False) -> npt.NDArray[MOTIF_FLOAT_T]:
@@ -223,6 +231,18 @@ def cwmTrimPoints(cwm: npt.NDArray,
     return (startBase, stopBase)
 
 
+def _quantileCutoff(values: npt.NDArray[MOTIF_FLOAT_T], quantile: float | None) -> float | None:
+    """Get the given quantile of values, or None if quantile is None.
+
+    Each score array only ever needs one quantile, and np.quantile finds it by
+    partitioning rather than sorting, so this is linear in the number of seqlets.
+    The result is a Python float so that it can go straight into the quantile json.
+    """
+    if quantile is None:
+        return None
+    return float(np.quantile(values, quantile))
+
+
 class Pattern:
     """A pattern is a simple data storage class.
 
@@ -465,21 +485,11 @@ class Pattern:
         your own quantile cutoffs, set the cutoffSeqMatch, cutoffContribMatch,
         and cutoffContribMagnitude members of this object.
         """
-        if quantileSeqMatch is not None:
-            self.cutoffSeqMatch =\
-                np.quantile(self.seqletSeqMatches, quantileSeqMatch)  # type: ignore
-        else:
-            self.cutoffSeqMatch = None
-        if quantileContribMatch is not None:
-            self.cutoffContribMatch =\
-                np.quantile(self.seqletContribMatches, quantileContribMatch)  # type: ignore
-        else:
-            self.cutoffContribMatch = None
-        if quantileContribMagnitude is not None:
-            self.cutoffContribMagnitude =\
-                np.quantile(self.seqletContribMagnitudes, quantileContribMagnitude)  # type: ignore
-        else:
-            self.cutoffContribMagnitude = None
+        self.cutoffSeqMatch = _quantileCutoff(self.seqletSeqMatches, quantileSeqMatch)
+        self.cutoffContribMatch = _quantileCutoff(self.seqletContribMatches,
+                                                  quantileContribMatch)
+        self.cutoffContribMagnitude = _quantileCutoff(self.seqletContribMagnitudes,
+                                                      quantileContribMagnitude)
 
     def seqletInfoIterator(self):
         """Make an iterator to go over the seqlets.
@@ -584,7 +594,8 @@ def seqletCutoffs(modiscoH5Fname: str, contribH5Fname: str,
                   quantileContribMatch: float, quantileContribMagnitude: float,
                   trimThreshold: float, trimPadding: int,
                   backgroundProbs: npt.NDArray[MOTIF_FLOAT_T],
-                  outputSeqletsFname: str | None = None) -> list[dict]:
+                  outputSeqletsFname: str | None = None,
+                  numThreads: int = 1) -> list[dict]:
     """Given a modisco hdf5 file, go over the seqlets and establish the quantile boundaries.
 
     If you give hard cutoffs for information content and L1 norm match, this function need not
@@ -624,6 +635,10 @@ def seqletCutoffs(modiscoH5Fname: str, contribH5Fname: str,
     :param outputSeqletsFname: (Optional) Gives a name for a file where the all of the
         seqlets in the Modisco output should be saved as a tsv file.
 
+    :param numThreads: (Optional) How many processes should analyze patterns at once.
+        Each pattern is independent, so with more than one thread every pattern
+        is handed to a worker process that opens its own copy of the modisco file.
+
     :return: A list of dicts that will be needed by the cwm scanning utility.
 
     The returned list is structured as follows::
@@ -643,17 +658,24 @@ def seqletCutoffs(modiscoH5Fname: str, contribH5Fname: str,
     """
     if isinstance(backgroundProbs, str):
         backgroundProbsVec = GENOME_NUCLEOTIDE_FREQUENCY[backgroundProbs]
-        logUtils.debug("Loaded background {0:s} for genome {1:s}"
-                       .format(str(backgroundProbsVec), backgroundProbs))
+        logUtils.debug("Loaded background %s for genome %s", backgroundProbsVec, backgroundProbs)
     else:
         backgroundProbsVec = np.array(backgroundProbs)
     patterns = makePatternObjects(patternSpec, modiscoH5Fname)
     logUtils.info("Initialized patterns, beginning to load data.")
-    with h5py.File(modiscoH5Fname, "r") as modiscoFp:
-        for pattern in patterns:
-            pattern.loadCwm(modiscoFp, trimThreshold, trimPadding, backgroundProbsVec)
-            pattern.loadSeqlets(modiscoFp)
-            pattern.getCutoffs(quantileSeqMatch, quantileContribMatch, quantileContribMagnitude)
+    quantiles = (quantileSeqMatch, quantileContribMatch, quantileContribMagnitude)
+    if numThreads > 1 and len(patterns) > 1:
+        # The workers send back their fully-loaded patterns, in the same order
+        # as the patterns we gave them.
+        jobs = [(pattern, modiscoH5Fname, trimThreshold, trimPadding,
+                 backgroundProbsVec, quantiles) for pattern in patterns]
+        with multiprocessing.Pool(min(numThreads, len(patterns))) as p:
+            patterns = p.map(_analyzePatternJob, jobs)
+    else:
+        with _openModisco(modiscoH5Fname) as modiscoFp:
+            for pattern in patterns:
+                _analyzePattern(pattern, modiscoFp, trimThreshold, trimPadding,
+                                backgroundProbsVec, quantiles)
     logUtils.info("Loaded and analyzed seqlet data.")
     if outputSeqletsFname is not None:
         # We should load up the genomic coordinates of the seqlets.
@@ -683,6 +705,29 @@ def seqletCutoffs(modiscoH5Fname: str, contribH5Fname: str,
     return ret
 
 
+def _openModisco(modiscoH5Fname: str) -> h5py.File:
+    """Open a modisco hdf5 for reading, with a chunk cache suited to the per-pattern loop."""
+    return h5py.File(modiscoH5Fname, "r", rdcc_nbytes=_MODISCO_RDCC_NBYTES,
+                     rdcc_nslots=_MODISCO_RDCC_NSLOTS, rdcc_w0=_MODISCO_RDCC_W0)
+
+
+def _analyzePattern(pattern: Pattern, modiscoFp: h5py.File, trimThreshold: float,
+                    trimPadding: int, backgroundProbsVec: npt.NDArray[MOTIF_FLOAT_T],
+                    quantiles: tuple[float, float, float]) -> None:
+    """Load the cwm and seqlets of one pattern and calculate its cutoffs."""
+    pattern.loadCwm(modiscoFp, trimThreshold, trimPadding, backgroundProbsVec)
+    pattern.loadSeqlets(modiscoFp)
+    pattern.getCutoffs(*quantiles)
+
+
+def _analyzePatternJob(job: tuple) -> Pattern:
+    """Run _analyzePattern in a worker process, which needs its own hdf5 handle."""
+    pattern, modiscoH5Fname, *analysisArgs = job
+    with _openModisco(modiscoH5Fname) as modiscoFp:
+        _analyzePattern(pattern, modiscoFp, *analysisArgs)
+    return pattern
+
+
 def makePatternObjects(patternSpec: list[dict] | str, modiscoH5Fname: str) -> list[Pattern]:
     """Get a list of patterns to scan.
 
@@ -728,7 +773,7 @@ def makePatternObjects(patternSpec: list[dict] | str, modiscoH5Fname: str) -> li
     else:
         patternSpecList: list[dict] = patternSpec  # type: ignore
         for metaclusterSpec in patternSpecList:
-            logUtils.debug("Initializing patterns {0:s}".format(str(metaclusterSpec)))
+            logUtils.debug("Initializing patterns %s", metaclusterSpec)
             if "pattern-names" in metaclusterSpec:
                 for i, patternName in enumerate(metaclusterSpec["pattern-names"]):
                     if "short-names" in metaclusterSpec:
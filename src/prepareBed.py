@@ -127,7 +127,7 @@ import pysam
 from bpreveal import logUtils
 import numpy as np
 import pybedtools
-from bpreveal.bedUtils import resize, sequenceChecker, lineToInterval, ParallelCounter
+from bpreveal.bedUtils import resizeMany, sequenceCheckerMany, lineToInterval, ParallelCounter
 random.seed(735014)
 
 
@@ -302,9 +302,9 @@ def removeOverlaps(config: dict, regions: pybedtools.BedTool | list,
     randomly chooses one of the overlapping regions.
     """
     # Resize the regions down to the minimum size.
-    resizedRegions = regions.each(resize,
-                                  config["resize-mode"],
-                                  config["overlap-max-distance"], genome).saveas()
+    resizedRegions = pybedtools.BedTool(resizeMany(regions,
+                                                   config["resize-mode"],
+                                                   config["overlap-max-distance"], genome))
     # The algorithm here requires that the regions be sorted.
     sortedRegions = resizedRegions.sort()
     piles = []
@@ -357,13 +357,12 @@ def filterByMaxCounts(config: dict, bigRegionsList: list[pybedtools.Interval],
         # Get the counts over every region.
         counter = ParallelCounter(bigwigLists[i], numThreads)
         bigCounts = np.zeros((len(bigRegionsList),))
-        for j, r in enumerate(bigRegionsList):
-            counter.addQuery((r.chrom, r.start, r.end), j)
-            pbar.update()
-        for _ in range(len(bigRegionsList)):
-            val, idx = counter.getResult()
-            bigCounts[idx] = val
-            pbar.update()
+        counter.addQueries([r.chrom for r in bigRegionsList],
+                           np.array([r.start for r in bigRegionsList]),
+                           np.array([r.end for r in bigRegionsList]),
+                           range(len(bigRegionsList)))
+        pbar.update(len(bigRegionsList))
+        counter.getResults(bigCounts, pbar)
         counter.done()
         if "max-counts" in headSpec:
             maxCounts = headSpec["max-counts"]
@@ -411,13 +410,12 @@ def filterByMinCounts(config: dict, smallRegionsList: list[pybedtools.Interval],
                 continue
         smallCounts = np.zeros((len(smallRegionsList),))
         counter = ParallelCounter(bigwigLists[i], numThreads)
-        for j, r in enumerate(smallRegionsList):
-            counter.addQuery((r.chrom, r.start, r.end), j)
-            pbar.update()
-        for _ in range(len(smallRegionsList)):
-            val, idx = counter.getResult()
-            smallCounts[idx] = val
-            pbar.update()
+        counter.addQueries([r.chrom for r in smallRegionsList],
+                           np.array([r.start for r in smallRegionsList]),
+                           np.array([r.end for r in smallRegionsList]),
+                           range(len(smallRegionsList)))
+        pbar.update(len(smallRegionsList))
+        counter.getResults(smallCounts, pbar)
         counter.done()
         if "min-counts" in headSpec:
             minCounts = headSpec["min-counts"]
@@ -470,12 +468,14 @@ def validateRegions(config: dict, regions: pybedtools.BedTool | list[pybedtools.
                             " overlap-max-distance parameter. This parameter is meaningless.")
         logUtils.debug("    Skipping region overlap removal.")
     # Second, resize the regions to their biggest size.
-    unfilteredBigRegions = initialRegions.each(resize,
-                                               config["resize-mode"],
-                                               config["input-length"] + config["max-jitter"] * 2,
-                                               genome).saveas()
-    logUtils.info("    Resized sequences. {0:d} remain.".format(unfilteredBigRegions.count()))
-    bigRegionsList = list(unfilteredBigRegions.filter(sequenceChecker, genome).saveas())
+    unfilteredBigRegionsList = resizeMany(initialRegions,
+                                          config["resize-mode"],
+                                          config["input-length"] + config["max-jitter"] * 2,
+                                          genome)
+    logUtils.info("    Resized sequences. {0:d} remain.".format(len(unfilteredBigRegionsList)))
+    validSequences = sequenceCheckerMany(unfilteredBigRegionsList, genome)
+    bigRegionsList = [r for r, isValid in zip(unfilteredBigRegionsList, validSequences)
+                      if isValid]
     logUtils.info("    Filtered for weird nucleotides. {0:d} remain.".format(len(bigRegionsList)))
     # Now, we have the possible regions. Get their counts values.
     validRegions = np.ones((len(bigRegionsList),))
@@ -483,21 +483,20 @@ def validateRegions(config: dict, regions: pybedtools.BedTool | list[pybedtools.
     # So go over every region and measure its counts (unless max-quantile == 1)
     # and reject regions that are over-full on reads.
     bigRegionsBed = filterByMaxCounts(config, bigRegionsList, bigwigLists, validRegions, numThreads)
-    smallRegionsList = list(bigRegionsBed.each(resize,
-                                               "center",
-                                               config["output-length"] - config["max-jitter"] * 2,
-                                               genome).saveas())
+    smallRegionsList = resizeMany(bigRegionsBed,
+                                  "center",
+                                  config["output-length"] - config["max-jitter"] * 2,
+                                  genome)
 
     filterByMinCounts(config, smallRegionsList, bigRegionsList, bigwigLists,
                       validRegions, numThreads)
     logUtils.info("    Validated small regions. Surviving regions: {0:d}"
                  .format(int(np.sum(validRegions))))
     # Now we resize to the final output size.
-    smallRegionsBed = pybedtools.BedTool(smallRegionsList)
-    outRegionsBed = smallRegionsBed.each(resize,
-                                         "center",
-                                         config["output-length"],
-                                         genome).saveas()
+    outRegionsList = resizeMany(smallRegionsList,
+                                "center",
+                                config["output-length"],
+                                genome)
 
     # Since we kept the array of valid regions separately,
     # we now have to create the result by combing over that array
@@ -505,7 +504,7 @@ def validateRegions(config: dict, regions: pybedtools.BedTool | list[pybedtools.
 
     filteredRegions = []
     rejectedRegions = []
-    for i, r in enumerate(outRegionsBed):
+    for i, r in enumerate(outRegionsList):
         if validRegions[i] == 1:
             filteredRegions.append(r)
         else:
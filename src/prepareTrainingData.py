@@ -102,11 +102,12 @@ from bpreveal.internal.constants import ONEHOT_T, ONEHOT_AR_T, PRED_AR_T, \
 
 
 def revcompSeq(oneHotSeq: ONEHOT_AR_T) -> ONEHOT_AR_T:
-    """Reverse-complement the given sequence."""
+    """Reverse-complement the given sequence, or each sequence in a batch of them."""
     # Since the order of the one-hot encoding is ACGT, if we flip the array
     # up-down, we complement the sequence, and if we flip it left-right, we
-    # reverse it. So reverse complement of the one hot sequence is just:
-    return np.flip(oneHotSeq)
+    # reverse it. So reverse complement of the one hot sequence is just
+    # flipping the last two axes.
+    return np.flip(oneHotSeq, axis=(-2, -1))
 
 
 def getSequences(bed: pybedtools.BedTool, genome: pysam.FastaFile, outputLength: int,
@@ -131,17 +132,15 @@ def getSequences(bed: pybedtools.BedTool, genome: pysam.FastaFile, outputLength:
     else:
         seqs = np.zeros((numSequences * 2, inputLength + 2 * jitter, 4), dtype=ONEHOT_T)
     padding = ((inputLength + 2 * jitter) - outputLength) // 2
-    for i, region in enumerate(bed):
-        chrom = region.chrom
-        start = region.start - padding
-        stop = region.stop + padding
-        seq = genome.fetch(chrom, start, stop)
-        if not revcomp:
-            seqs[i] = utils.oneHotEncode(seq)
-        else:
-            sret = utils.oneHotEncode(seq)
-            seqs[i * 2] = sret
-            seqs[i * 2 + 1] = revcompSeq(sret)
+    seqStrs = [genome.fetch(region.chrom, region.start - padding, region.stop + padding)
+               for region in bed]
+    if not revcomp:
+        utils.oneHotEncodeBatch(seqStrs, out=seqs)
+    else:
+        # Forward sequences go in the even slots, and their reverse complements
+        # in the odd slots right after them.
+        utils.oneHotEncodeBatch(seqStrs, out=seqs[0::2])
+        seqs[1::2] = revcompSeq(seqs[0::2])
     return seqs
 
 
@@ -2,23 +2,81 @@
 """Builds the schema.py module."""
 import sys
 import json
+
+# The generated module reads the .schema files that ship next to it
+# instead of carrying a copy of each one as a string literal.
+_LOAD_SCHEMA_SOURCE = '''try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+_SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schematools")
+
+
+def _loadSchema(schemaName: str) -> dict:
+    """Read schematools/<schemaName>.schema, using orjson if it is installed."""
+    with open(os.path.join(_SCHEMA_DIR, schemaName + ".schema"), "rb") as fp:
+        return _loads(fp.read())
+'''
+
+# Building a Draft7Validator walks its whole schema, and most programs only
+# ever use one of them, so the generated module builds each one on first use.
+_LAZY_VALIDATOR_SOURCE = '''class _LazyValidator:
+    """Builds a Draft7Validator for its schema the first time it is used.
+
+    Attribute lookups like validate and is_valid are forwarded to the validator.
+    """
+
+    __slots__ = ("_schema", "_validator")
+
+    def __init__(self, schema: dict):
+        self._schema = schema
+        self._validator = None
+
+    def _get(self) -> Draft7Validator:
+        if self._validator is None:
+            self._validator = Draft7Validator(self._schema, registry=_registry)
+        return self._validator
+
+    def __getattr__(self, name: str):
+        # Only called for names that aren't found normally. Private and dunder
+        # names (including our own slots before __init__ has filled them, and
+        # the hooks that copy and pickle look for) are not forwarded, since
+        # _get would need those slots itself and recurse forever.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._get(), name)
+
+    def __repr__(self) -> str:
+        schema = getattr(self, "_schema", None)
+        title = schema.get("title", "?") if isinstance(schema, dict) else "?"
+        state = "built" if getattr(self, "_validator", None) is not None else "not yet built"
+        return "<_LazyValidator for {0:s} ({1:s})>".format(title, state)
+'''
+
 with open(sys.argv[1], "w") as fp:
-    fp.write('"""Auto-generated schema validators for the JSON files used by the main CLI."""\n')
+    fp.write('"""Auto-generated schema validators for the JSON files used by the main CLI.\n\n'
+             'Each validator here is a ``_LazyValidator``, not a ``jsonschema.Draft7Validator``,\n'
+             'so ``isinstance(v, Draft7Validator)`` is False. It builds its Draft7Validator the\n'
+             'first time it is used, and forwards every attribute (``validate``, ``is_valid``,\n'
+             '``iter_errors``, ...) to it.\n"""\n')
     fp.write("# pylint: disable=line-too-long\n")
-    fp.write("import json\n")
+    fp.write("import os\n")
     fp.write("from jsonschema import Draft7Validator\n")
     fp.write("from referencing import Registry\n")
     fp.write("from referencing.jsonschema import DRAFT7\n\n")
     fp.write("# DO NOT EDIT THIS FILE - IT IS AUTO-GENERATED BY build.py\n")
     fp.write("# TO CHANGE A SCHEMA, EDIT THE CORRESPONDING .schema FILE\n")
     fp.write("# AND RUN make schemas OR make all IN THE src DIRECTORY.\n")
+    fp.write(_LOAD_SCHEMA_SOURCE)
+    fp.write("\n\n")
     docstrings = []
     for schemaFname in sys.argv[2:]:
-        fp.write("_" + schemaFname + 'Schema = json.loads("""')
+        # Parse each file here so that a broken schema fails the build
+        # rather than the first program that imports this module.
         with open("schematools/" + schemaFname + ".schema", "r") as sfp:
-            jsonStr = json.dumps(json.load(sfp))
-            fp.write(jsonStr)
-        fp.write('""")  # noqa\n')
+            json.load(sfp)
+        fp.write("_" + schemaFname + 'Schema = _loadSchema("' + schemaFname + '")\n')
         fp.write("_" + schemaFname + "Schema['$id'] = 'https://example.com/"
                  "schema/" + schemaFname + "'\n")
     fp.write("_schemaStore = {")
@@ -32,20 +90,23 @@ with open(sys.argv[1], "w") as fp:
     #     fp.write(("_{0:s}Resolver = RefResolver.from_schema("
     #              "_{0:s}Schema, store=_schemaStore)\n").format(schemaFname))
     fp.write("\n\n")
+    fp.write(_LAZY_VALIDATOR_SOURCE)
+    fp.write("\n\n")
     for schemaFname in sys.argv[2:]:
         fp.write(
-            "{0:s}: Draft7Validator = Draft7Validator(_{0:s}Schema, registry=_registry)\n".
+            "{0:s}: _LazyValidator = _LazyValidator(_{0:s}Schema)\n".
             format(schemaFname))
         docName = schemaFname
         if schemaFname in ["addNoise"]:
             docName = "tools." + docName
-        fp.write('"""Validator for :py:mod:`{0:s}<bpreveal.{1:s}>`"""\n'.
-                 format(schemaFname, docName))
-    fp.write("schemaMap = {")
+        fp.write('"""Validator for :py:mod:`{0:s}<bpreveal.{1:s}>`, a _LazyValidator that '
+                 'forwards to a Draft7Validator."""\n'.format(schemaFname, docName))
+    fp.write("schemaMap: dict[str, _LazyValidator] = {")
     for schemaFname in sys.argv[2:]:
         fp.write('"{0:s}": {0:s},'.format(schemaFname))
     fp.write('}\n')
     fp.write('"""A mapping from a string naming a BPReveal program to '
         'the corresponding schema.\n\n'
-        'Usage::\n\n    schemaMap["prepareBed"](configJson)\n"""\n')
+        'Each value is a _LazyValidator, which forwards to a Draft7Validator.\n\n'
+        'Usage::\n\n    schemaMap["prepareBed"].validate(configJson)\n"""\n')
 # Copyright 2022, 2023, 2024 Charles McAnany. This file is part of BPReveal. BPReveal is free software: You can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 2 of the License, or (at your option) any later version. BPReveal is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with BPReveal. If not, see <https://www.gnu.org/licenses/>.  # noqa
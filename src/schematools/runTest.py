@@ -4,6 +4,9 @@ import jsonschema
 import json
 import bpreveal.schema as schemas
 import os
+import subprocess
+import sys
+import tempfile
 
 import argparse
 p = argparse.ArgumentParser(description="Check the test cases for schemas.")
@@ -54,7 +57,45 @@ print("\u2612 = bad json, passed schema.")
 print("\u2717 = good json, failed schema.")
 print("\u29B8 = passed wrong schema.")
 
+
+
+def runServeTest():
+    """Make sure that checkJson --serve answers for every file, even ones it can't read.
+
+    Sends a missing file, a malformed file, and then a known-good file through
+    one server. All three should get a line of output, and the good one should
+    match its schema.
+    """
+    goodFname = os.path.abspath("testcases/prepareBed_good_0.json")
+    with tempfile.TemporaryDirectory() as tmpDir:
+        missingFname = os.path.join(tmpDir, "missing.json")
+        malformedFname = os.path.join(tmpDir, "malformed.json")
+        with open(malformedFname, "w") as fp:
+            fp.write('{"genome": ')
+        fnames = [missingFname, malformedFname, goodFname]
+        ret = subprocess.run([sys.executable, "-m", "bpreveal.checkJson", "--serve"],
+                             input="".join(f + "\n" for f in fnames), capture_output=True,
+                             text=True, check=False)
+    lines = ret.stdout.splitlines()
+    checks = [("server exited cleanly", ret.returncode == 0),
+              ("one answer per file", len(lines) == 3),
+              ("missing file reported",
+               len(lines) > 0 and lines[0].startswith(missingFname + " FAILED to load")),
+              ("malformed file reported",
+               len(lines) > 1 and lines[1].startswith(malformedFname + " FAILED to load")),
+              ("good file matched",
+               len(lines) > 2 and lines[2].startswith(goodFname + " \u2192")
+               and "prepareBed" in lines[2].split())]
+    for name, passed in checks:
+        if not passed:
+            print("\u2717 checkJson --serve, {0:s}".format(name))
+            print(ret.stdout + ret.stderr)
+        elif args.showCorrect:
+            print("    \u2713 checkJson --serve, {0:s}".format(name))
+
+
 for f in os.listdir("testcases"):
     s, goodBad, _ = f.split('_')
     runTest(s, f, goodBad == "good")
+runServeTest()
 # Copyright 2022, 2023, 2024 Charles McAnany. This file is part of BPReveal. BPReveal is free software: You can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 2 of the License, or (at your option) any later version. BPReveal is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with BPReveal. If not, see <https://www.gnu.org/licenses/>.  # noqa
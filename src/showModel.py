@@ -21,15 +21,13 @@ os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "1"
 from bpreveal import logUtils
 from bpreveal import utils
-
-
-if __name__ == "__main__":
-    utils.setMemoryGrowth()
+# No need to call utils.setMemoryGrowth() since CUDA is disabled above.
 
 
 def main(modelFname: str, pngFile: str | None):
     """Read in the model named by modelFname, show it as text, and optionally save as a png."""
-    model = utils.loadModel(modelFname)
+    # We never train or evaluate the model here, so skip rebuilding its optimizer.
+    model = utils.loadModel(modelFname, compile=False)
     print(model.summary(expand_nested=True, show_trainable=True))
     if pngFile is not None:
         from tensorflow.keras.utils import plot_model  # pylint: disable=import-outside-toplevel
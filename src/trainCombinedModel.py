@@ -45,27 +45,30 @@ API
 ---
 """
 import json
-import bpreveal.internal.disableTensorflowLogging  # pylint: disable=unused-import # noqa
 from bpreveal import utils
-if __name__ == "__main__":
-    utils.setMemoryGrowth()
-from tensorflow import keras
-import bpreveal.training
-from bpreveal import models
 from bpreveal import logUtils
 # pylint: disable=duplicate-code
 
 
 def main(config):
     """Build and train a combined model."""
+    # TensorFlow is only imported once we're ready to build models, so that a bad
+    # configuration file is rejected without waiting for it to load.
+    # pylint: disable=import-outside-toplevel
+    import bpreveal.internal.disableTensorflowLogging  # pylint: disable=unused-import # noqa
+    from tensorflow import keras
+    import bpreveal.training
+    from bpreveal import models
+    # pylint: enable=import-outside-toplevel
     logUtils.setVerbosity(config["verbosity"])
     logUtils.debug("Initializing")
     inputLength = config["settings"]["architecture"]["input-length"]
     outputLength = config["settings"]["architecture"]["output-length"]
-    regressionModel = utils.loadModel(
-        config["settings"]["transformation-model"]["transformation-model-file"])
+    regressionFname = config["settings"]["transformation-model"]["transformation-model-file"]
+    regressionModel = utils.loadModel(regressionFname)
     regressionModel.trainable = False
-    logUtils.debug("Loaded regression model.")
+    # Pass arguments rather than formatting them, so nothing is built if debug is off.
+    logUtils.debug("Loaded regression model from %s", regressionFname)
     combinedModel, residualModel, _ = models.combinedModel(
         inputLength, outputLength,
         config["settings"]["architecture"]["filters"],
@@ -73,14 +76,19 @@ def main(config):
         config["settings"]["architecture"]["input-filter-width"],
         config["settings"]["architecture"]["output-filter-width"],
         config["heads"], regressionModel)
+    # Both models share their heads, so they also share one set of losses.
+    # (buildLosses can't be cached, since it puts the adaptive loss variables
+    # into config["heads"].) Each model still needs its own optimizer, because
+    # an optimizer holds state for the variables of the model it was built for.
     losses, lossWeights = bpreveal.training.buildLosses(config["heads"])
+    optimizerConfig = {"learning_rate": config["settings"]["learning-rate"]}
 
     residualModel.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=config["settings"]["learning-rate"]),
+        optimizer=keras.optimizers.Adam(**optimizerConfig),
         loss=losses, loss_weights=lossWeights)
 
     combinedModel.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=config["settings"]["learning-rate"]),
+        optimizer=keras.optimizers.Adam(**optimizerConfig),
         loss=losses, loss_weights=lossWeights)
 
     logUtils.debug("Models compiled.")
@@ -96,5 +104,6 @@ if __name__ == "__main__":
         configJson = json.load(configFp)
     import bpreveal.schema
     bpreveal.schema.trainCombinedModel.validate(configJson)
+    utils.setMemoryGrowth()
     main(configJson)
 # Copyright 2022, 2023, 2024 Charles McAnany. This file is part of BPReveal. BPReveal is free software: You can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 2 of the License, or (at your option) any later version. BPReveal is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with BPReveal. If not, see <https://www.gnu.org/licenses/>.  # noqa
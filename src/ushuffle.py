@@ -1,19 +1,59 @@
 """A wrapper around the ushuffle C implementation."""
-import threading
+import random
 import numpy as np
 from bpreveal.internal import libushuffle
 from bpreveal.internal.constants import ONEHOT_AR_T
 
-# The ushuffle implementation in C makes heavy use of global variables.
-# To avoid multiple threads trampling over each other and causing races,
-# declare a lock that must be obtained before ushuffle code is run.
-# Note that this is a THREADING lock, not a MULTIPROCESSING lock.
-# With multiprocessing, each process has its own copy of the global variables
-# in ushuffle, so there's no need for a lock between processes.
-_SHUFFLE_LOCK = threading.Lock()
+# The ushuffle implementation in C keeps all of its state, including its random
+# number generator, in a structure that belongs to a single call, and it releases
+# the GIL while it works. So threads can shuffle at the same time without a lock.
+# Every call needs a seed; when the caller doesn't give one, it comes from here.
+_SEED_SOURCE = random.Random()
 
-# Set up the RNG.
-libushuffle.initialize()
+
+def seedRng(seed: int) -> None:
+    """Seed the generator that picks seeds for calls that aren't given one.
+
+    :param seed: The seed to use.
+
+    After this, the sequence of shuffles made by calls that don't pass a seed
+    is reproducible. Passing a seed to one of the shuffle functions does the
+    same thing, so the unseeded calls after it are reproducible too.
+    """
+    _SEED_SOURCE.seed(seed)
+
+
+def _getSeed(seed: int | None) -> int:
+    """Return the seed for one call to the C library.
+
+    If seed is given, it is used directly, and it also reseeds the seed source,
+    so that the unseeded calls that follow continue a reproducible stream.
+    """
+    if seed is None:
+        return _SEED_SOURCE.getrandbits(31)
+    seedRng(seed)
+    return seed
+
+
+def shuffleStringBatch(sequence: str, kmerSize: int, numShuffles: int = 1,
+                       seed: int | None = None) -> np.ndarray:
+    """Shuffle a string like :py:func:`shuffleString`, but return the raw bytes.
+
+    :param sequence: The string to shuffle.
+    :param kmerSize: The kmer size whose distribution will be preserved.
+    :param numShuffles: How many shuffled sequences to make.
+    :param seed: (Optional) A seed for the random number generator. Giving a seed
+        also reseeds the generator used by later calls that don't give one;
+        see :py:func:`seedRng<bpreveal.ushuffle.seedRng>`.
+    :return: A uint8 array of shape (numShuffles, numBytes), where each row is the
+        utf-8 encoding of one shuffled string.
+
+    If you're going to feed the shuffles straight into more numpy code, this
+    skips turning each one back into a Python string.
+    """
+    ar = np.frombuffer(sequence.encode("utf-8"), dtype=np.int8)
+    shuffledArrays = libushuffle.shuffleStr(ar, kmerSize, numShuffles, _getSeed(seed))
+    return shuffledArrays.view(np.uint8)
 
 
 def shuffleString(sequence: str, kmerSize: int, numShuffles: int = 1,
@@ -26,17 +66,20 @@ def shuffleString(sequence: str, kmerSize: int, numShuffles: int = 1,
     as long as the longest byte sequence for a character in the input.
     (Please don't rely on this random fact!)
 
+    If seed is given, the shuffles are reproducible, and so are the shuffles
+    from any later calls that don't give a seed.
+    See :py:func:`seedRng<bpreveal.ushuffle.seedRng>`.
+
     Returns a list of shuffled strings.
     """
-    ar = np.frombuffer(sequence.encode("utf-8"), dtype=np.int8)
-    with _SHUFFLE_LOCK:
-        if seed is not None:
-            libushuffle.seedRng(seed)
-        shuffledArrays = libushuffle.shuffleStr(ar, kmerSize, numShuffles)
-    ret = []
-    for i in range(numShuffles):
-        ret.append(shuffledArrays[i].tobytes().decode("utf-8"))
-    return ret
+    shuffledArrays = shuffleStringBatch(sequence, kmerSize, numShuffles, seed)
+    if sequence.isascii():
+        # Every byte is a character, so decode all the shuffles in one go and
+        # slice the rows back out.
+        allShuffles = shuffledArrays.tobytes().decode("ascii")
+        seqLen = shuffledArrays.shape[1]
+        return [allShuffles[i * seqLen:(i + 1) * seqLen] for i in range(numShuffles)]
+    return [row.tobytes().decode("utf-8") for row in shuffledArrays]
 
 
 def shuffleOHE(sequence: ONEHOT_AR_T, kmerSize: int, numShuffles: int = 1,
@@ -59,13 +102,14 @@ def shuffleOHE(sequence: ONEHOT_AR_T, kmerSize: int, numShuffles: int = 1,
         4   0 0 0 0
 
     This is adapted from ushuffle.
+    If seed is given, the shuffles are reproducible, and so are the shuffles
+    from any later calls that don't give a seed.
+    See :py:func:`seedRng<bpreveal.ushuffle.seedRng>`.
+
     Returns an array of shape (numShuffles, length, alphabetLength)
     """
     assert sequence.shape[1] <= 8, "Cannot ushuffle a one-hot encoded sequence with "\
                                    "an alphabet of more than 8 characters."
-    with _SHUFFLE_LOCK:
-        if seed is not None:
-            libushuffle.seedRng(seed)
-        shuffledSeqs = libushuffle.shuffleOhe(sequence, kmerSize, numShuffles)
+    shuffledSeqs = libushuffle.shuffleOhe(sequence, kmerSize, numShuffles, _getSeed(seed))
     return shuffledSeqs
 # Copyright 2022, 2023, 2024 Charles McAnany. This file is part of BPReveal. BPReveal is free software: You can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 2 of the License, or (at your option) any later version. BPReveal is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with BPReveal. If not, see <https://www.gnu.org/licenses/>.  # noqa
@@ -1,11 +1,13 @@
 """Lots of helpful utilities for working with models."""
 from collections import deque
+import functools
 import multiprocessing
 import os
 import queue
 import re
 import subprocess as sp
 import typing
+import warnings
 from collections.abc import Iterable
 import scipy
 import pyBigWig
@@ -18,7 +20,7 @@ from bpreveal.internal.constants import ONEHOT_AR_T, PRED_AR_T, ONEHOT_T, \
 from bpreveal.internal import constants
 
 
-def loadModel(modelFname: str):
+def loadModel(modelFname: str, compile: bool = True):  # pylint: disable=redefined-builtin
     """Load up a BPReveal model.
 
     .. note::
@@ -26,6 +28,8 @@ def loadModel(modelFname: str):
 
     :param modelFname: The name of the model that Keras saved earlier, typically
         a directory.
+    :param compile: Passed on to Keras. If False, the model is not compiled, which
+        is faster to load if you only need to look at it or predict with it.
     :return: A Keras Model object.
 
     The returned model does NOT support additional training, since it uses a
@@ -47,11 +51,16 @@ def loadModel(modelFname: str):
     # pylint: enable=import-outside-toplevel
     model = load_model(modelFname,
                        custom_objects={"multinomialNll": multinomialNll,
-                                       "reweightableMse": dummyMse})
+                                       "reweightableMse": dummyMse},
+                       compile=compile)
     constants.setTensorflowLoaded()
     return model
 
 
+_MEMORY_GROWTH_SET: bool = False
+"""Has setMemoryGrowth already configured the GPUs in this process?"""
+
+
 def setMemoryGrowth() -> None:
     """Turn on the tensorflow option to grow memory usage as needed.
 
@@ -60,18 +69,29 @@ def setMemoryGrowth() -> None:
 
     All of the main programs in BPReveal do this, so that you can
     use your GPU for other stuff as you work with models.
+    Growth is turned on for every visible GPU, and calling this again
+    after it has succeeded does nothing.
     """
+    global _MEMORY_GROWTH_SET
+    if _MEMORY_GROWTH_SET:
+        return
     # pylint: disable=import-outside-toplevel, unused-import
     import bpreveal.internal.disableTensorflowLogging  # noqa
     import tensorflow as tf
     # pylint: enable=import-outside-toplevel, unused-import
     gpus = tf.config.list_physical_devices("GPU")
-    try:
-        tf.config.experimental.set_memory_growth(gpus[0], True)
-        logUtils.debug("GPU memory growth enabled.")
-    except Exception as inst:  # pylint: disable=broad-exception-caught
+    if not gpus:
         logUtils.warning("Not using GPU")
-        logUtils.debug("Because: " + str(inst))
+    else:
+        try:
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+            _MEMORY_GROWTH_SET = True
+            logUtils.debug("GPU memory growth enabled on {0:d} GPU(s).".format(len(gpus)))
+        except (RuntimeError, ValueError) as inst:
+            # RuntimeError means the GPUs were already initialized.
+            logUtils.warning("Could not enable GPU memory growth.")
+            logUtils.debug("Because: " + str(inst))
     constants.setTensorflowLoaded()
 
 
@@ -182,13 +202,9 @@ def loadChromSizes(chromSizesFname: str | None = None,
 
     """
     if chromSizesFname is not None:
-        ret = {}
-        with open(chromSizesFname, "r") as fp:
-            for line in fp:
-                if len(line) > 2:
-                    chrom, size = line.split()
-                    ret[chrom] = int(size)
-        return ret
+        # Copy, since callers are free to modify the dict we give them.
+        return dict(_loadChromSizesFile(chromSizesFname,
+                                        os.path.getmtime(chromSizesFname)))
     if genomeFname is not None:
         with pysam.FastaFile(genomeFname) as genome:
             chromNames = genome.references
@@ -209,6 +225,25 @@ def loadChromSizes(chromSizesFname: str | None = None,
     assert False, "You can't ask for chrom sizes without some argument!"
 
 
+@functools.lru_cache(maxsize=16)
+def _loadChromSizesFile(chromSizesFname: str, mtime: float) -> dict[str, int]:
+    """Parse a chrom.sizes file.
+
+    The modification time is only part of the cache key, so that a file that
+    gets rewritten is read again.
+    """
+    del mtime
+    # Read the names as plain str so that long contig names aren't truncated
+    # to a fixed-width dtype. loadtxt warns about blank lines and empty files,
+    # both of which are fine here.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        table = np.loadtxt(chromSizesFname, dtype=str, ndmin=2)
+    if table.size == 0:
+        return {}
+    return dict(zip(table[:, 0].tolist(), table[:, 1].astype(np.int64).tolist()))
+
+
 def blankChromosomeArrays(genomeFname: str | None = None,
                           chromSizesFname: str | None = None,
                           bwHeader: dict[str, int] | None = None,
@@ -304,6 +339,20 @@ def writeBigwig(bwFname: str, chromDict: dict[str, np.ndarray] | None = None,
     logUtils.debug("Bigwig closed.")
 
 
+# Row i of this table is the one-hot encoding of the byte with value i, so
+# A/a is [1, 0, 0, 0] and so on, and anything that isn't a base is all zeros.
+_ONEHOT_TABLE = np.zeros((256, 4), dtype=ONEHOT_T)
+for _baseIdx, _base in enumerate("ACGT"):
+    _ONEHOT_TABLE[ord(_base), _baseIdx] = 1
+    _ONEHOT_TABLE[ord(_base.lower()), _baseIdx] = 1
+# Each row is exactly four bytes, so oneHotEncode can look up a whole row as
+# one uint32 and then view the result as (length, 4) bytes again.
+_ONEHOT_ROWS = _ONEHOT_TABLE.view(np.uint32).reshape((256,))
+
+# About how many bases oneHotEncodeBatch joins and encodes at once.
+_ONEHOT_BATCH_BASES = 1 << 24
+
+
 def oneHotEncode(sequence: str, allowN: bool = False) -> ONEHOT_AR_T:
     """Convert the string sequence into a one-hot encoded numpy array.
 
@@ -344,18 +393,9 @@ def oneHotEncode(sequence: str, allowN: bool = False) -> ONEHOT_AR_T:
         # ACGTTT
 
     """
-    if allowN:
-        initFunc = np.zeros
-    else:
-        # We're going to overwrite every position, so don't bother with
-        # initializing the array.
-        initFunc = np.empty
-    ret = initFunc((len(sequence), 4), dtype=ONEHOT_T)
-    ordSeq = np.fromstring(sequence, np.int8)  # type:ignore
-    ret[:, 0] = (ordSeq == ord("A")) + (ordSeq == ord("a"))
-    ret[:, 1] = (ordSeq == ord("C")) + (ordSeq == ord("c"))
-    ret[:, 2] = (ordSeq == ord("G")) + (ordSeq == ord("g"))
-    ret[:, 3] = (ordSeq == ord("T")) + (ordSeq == ord("t"))
+    ordSeq = np.frombuffer(sequence.encode("ascii"), np.uint8)
+    # One pass over the sequence, instead of two compares per base.
+    ret = np.take(_ONEHOT_ROWS, ordSeq).view(ONEHOT_T).reshape((len(sequence), 4))
     if not allowN:
         assert (np.sum(ret) == len(sequence)), \
             "Sequence contains unrecognized nucleotides. "\
@@ -363,6 +403,48 @@ def oneHotEncode(sequence: str, allowN: bool = False) -> ONEHOT_AR_T:
     return ret
 
 
+def oneHotEncodeBatch(sequences: list[str], allowN: bool = False,
+                      out: ONEHOT_AR_T | None = None) -> ONEHOT_AR_T:
+    """Convert many sequences of the same length into one-hot encoded arrays at once.
+
+    :param sequences: The sequences to encode. They must all be the same length.
+    :param allowN: Same as in :py:func:`oneHotEncode<bpreveal.utils.oneHotEncode>`.
+    :param out: (Optional) An array of shape (numSequences, length, 4) that the
+        encoded sequences will be written into.
+    :return: An array of shape (numSequences, length, 4). If you gave ``out``, this
+        is ``out``.
+
+    ``oneHotEncodeBatch(seqs)[i]`` is the same as ``oneHotEncode(seqs[i])``, but the
+    table lookup is done once over all of the sequences instead of once per sequence.
+    """
+    seqLength = len(sequences[0]) if sequences else 0
+    if out is None:
+        out = np.empty((len(sequences), seqLength, 4), dtype=ONEHOT_T)
+    if not sequences:
+        return out
+    assert out.shape[:2] == (len(sequences), seqLength), \
+        "out must have shape (numSequences, length, 4)."
+    # The table lookup writes straight into out, seen as one uint32 per base,
+    # and the text is encoded a batch at a time, so the only full-size array
+    # is out itself.
+    outRows = out.view(np.uint32)
+    batchSize = max(1, _ONEHOT_BATCH_BASES // max(1, seqLength))
+    for batchStart in range(0, len(sequences), batchSize):
+        batch = sequences[batchStart:batchStart + batchSize]
+        ordSeq = np.frombuffer("".join(batch).encode("ascii"), np.uint8)
+        assert ordSeq.shape[0] == len(batch) * seqLength, \
+            "All sequences must have the same length."
+        # Every uint8 is a valid index, so skip the bounds check (and the
+        # output buffering that comes with it).
+        np.take(_ONEHOT_ROWS, ordSeq.reshape((len(batch), seqLength, 1)),
+                out=outRows[batchStart:batchStart + len(batch)], mode="wrap")
+    if not allowN:
+        assert (np.sum(out) == out.shape[0] * seqLength), \
+            "Sequence contains unrecognized nucleotides. "\
+            "Maybe your sequence contains 'N'?"
+    return out
+
+
 def oneHotDecode(oneHotSequence: np.ndarray) -> str:
     """Take a one-hot encoded sequence and turn it back into a string.
 